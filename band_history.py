@@ -0,0 +1,251 @@
+"""
+Per-symbol price band history built from daily NSE band files.
+
+NSE revises price bands frequently (20% -> 10% -> 5% ...), so the band in
+force today is not necessarily the band that applied two weeks ago. This
+store keeps, for every symbol, a sorted array of change points
+(effective_date, band) and answers "which band applied on day D" by bisection.
+
+Only change points are stored, and dates/bands live in compact `array`
+buffers, so the full NSE universe (~2,500 symbols, years of files) fits in a
+few MB.
+"""
+
+import os
+import csv
+import bisect
+import math
+from array import array
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from nse_http import download_file
+
+# Daily band files: NSE's sec_list format, one file per day named sec_list_DDMMYYYY.csv
+BAND_DIR = os.path.join("data", "bands")
+BAND_FILE_PREFIX = "sec_list_"
+BAND_FILE_DATE_FORMAT = "%d%m%Y"
+# Bands seen in the scan's own NSE responses are kept apart from NSE's files,
+# so NSE's files are never rewritten: sec_list_DDMMYYYY_observed.csv
+OBSERVED_SUFFIX = "_observed"
+
+# NSE's current band file for the whole universe (published each evening for the next session)
+BAND_FILE_URL = "https://nsearchives.nseindia.com/content/equities/sec_list.csv"
+
+
+def parse_band(value) -> Optional[float]:
+    """
+    Parse a band value from NSE ('20', '10.00', 'No Band', ...)
+
+    Returns:
+        Band percentage, NaN for 'No Band' (no circuit applies), None if unparseable
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not text:
+        return None
+    if text.lower().replace(" ", "") == "noband":
+        return math.nan
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class BandHistory:
+    """
+    Time-indexed price band store with O(log n) lookups per symbol/day
+    """
+
+    def __init__(self, band_dir: str = BAND_DIR):
+        self.band_dir = band_dir
+        self._dates: Dict[str, array] = {}   # symbol -> sorted date ordinals ('i')
+        self._bands: Dict[str, array] = {}   # symbol -> band in force from that date ('f')
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        """Load all band files from disk on first use"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.isdir(self.band_dir):
+            return
+
+        dated_files = []
+        for filename in os.listdir(self.band_dir):
+            day = self._date_from_filename(filename)
+            if day is not None:
+                dated_files.append((day, filename.endswith(f"{OBSERVED_SUFFIX}.csv"), filename))
+
+        # Chronological order keeps every insert an O(1) append; for the same day
+        # the scan's observed bands are applied after NSE's file
+        for day, _, filename in sorted(dated_files):
+            self._load_file(os.path.join(self.band_dir, filename), day)
+
+    @staticmethod
+    def _date_from_filename(filename: str) -> Optional[date]:
+        if not (filename.startswith(BAND_FILE_PREFIX) and filename.endswith(".csv")):
+            return None
+        stamp = filename[len(BAND_FILE_PREFIX):-len(".csv")]
+        if stamp.endswith(OBSERVED_SUFFIX):
+            stamp = stamp[:-len(OBSERVED_SUFFIX)]
+        try:
+            return datetime.strptime(stamp, BAND_FILE_DATE_FORMAT).date()
+        except ValueError:
+            return None
+
+    def _load_file(self, path: str, day: date):
+        """Read one sec_list file (Symbol, Series, Security Name, Band, Remarks)"""
+        ordinal = day.toordinal()
+        with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames:
+                return
+            # NSE headers vary in case and padding between releases
+            columns = {name.strip().lower(): name for name in reader.fieldnames}
+            symbol_col = columns.get("symbol")
+            series_col = columns.get("series")
+            band_col = columns.get("band")
+            if not symbol_col or not band_col:
+                return
+
+            # A symbol can be listed under several series; the EQ row wins
+            file_bands: Dict[str, float] = {}
+            eq_symbols = set()
+            for row in reader:
+                symbol = (row.get(symbol_col) or "").strip()
+                band = parse_band(row.get(band_col))
+                if not symbol or band is None or symbol in eq_symbols:
+                    continue
+                file_bands[symbol] = band
+                if series_col and (row.get(series_col) or "").strip() == "EQ":
+                    eq_symbols.add(symbol)
+
+        for symbol, band in file_bands.items():
+            self._add(symbol, ordinal, band)
+
+    def _add(self, symbol: str, ordinal: int, band: float):
+        """Insert an observation, keeping only change points"""
+        dates = self._dates.get(symbol)
+        if dates is None:
+            self._dates[symbol] = array("i", [ordinal])
+            self._bands[symbol] = array("f", [band])
+            return
+
+        bands = self._bands[symbol]
+        position = bisect.bisect_right(dates, ordinal)
+        if position > 0 and dates[position - 1] == ordinal:
+            bands[position - 1] = band  # Same day seen twice - latest file wins
+            return
+        if position > 0 and _same_band(bands[position - 1], band):
+            return  # Band unchanged since the previous change point
+        dates.insert(position, ordinal)
+        bands.insert(position, band)
+
+    def record(self, day: date, bands: Dict[str, float]):
+        """
+        Record the bands observed on a day in that day's observed band file
+
+        NSE's own sec_list file for the day, if present, is left untouched.
+
+        Args:
+            day: Trading date the bands were in force
+            bands: Mapping of symbol -> band percentage (NaN for 'No Band')
+        """
+        self._ensure_loaded()
+        if not bands:
+            return
+
+        os.makedirs(self.band_dir, exist_ok=True)
+        path = os.path.join(self.band_dir,
+                            f"{BAND_FILE_PREFIX}{day.strftime(BAND_FILE_DATE_FORMAT)}{OBSERVED_SUFFIX}.csv")
+
+        # Merge with observations from an earlier run on the same day
+        merged: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+                for row in csv.DictReader(f):
+                    row = {k.strip().lower(): v for k, v in row.items() if k}
+                    if row.get("symbol"):
+                        merged[row["symbol"].strip()] = (row.get("band") or "").strip()
+        for symbol, band in bands.items():
+            merged[symbol] = "No Band" if math.isnan(band) else f"{band:g}"
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Symbol", "Band"])
+            for symbol in sorted(merged):
+                writer.writerow([symbol, merged[symbol]])
+        os.replace(tmp_path, path)
+
+        ordinal = day.toordinal()
+        for symbol, band in bands.items():
+            self._add(symbol, ordinal, band)
+
+    def download(self, effective_date: date) -> bool:
+        """
+        Download NSE's current band file and store it as the bands for `effective_date`
+
+        Returns:
+            True if the file was downloaded and loaded
+        """
+        self._ensure_loaded()
+        path = os.path.join(self.band_dir, f"{BAND_FILE_PREFIX}{effective_date.strftime(BAND_FILE_DATE_FORMAT)}.csv")
+        if not download_file(BAND_FILE_URL, path, "Band file", is_valid=lambda content: b"Band" in content[:200]):
+            return False
+        self._load_file(path, effective_date)
+        return True
+
+    def band_on(self, symbol: str, day: date) -> Optional[float]:
+        """
+        Band in force for a symbol on a given day
+
+        Returns:
+            Band percentage (NaN for 'No Band'), or None if the day predates all observations
+        """
+        self._ensure_loaded()
+        dates = self._dates.get(symbol)
+        if dates is None:
+            return None
+        position = bisect.bisect_right(dates, day.toordinal())
+        if position == 0:
+            return None
+        return self._bands[symbol][position - 1]
+
+    def bands_for(self, symbol: str, days: Iterable, default: float) -> List[float]:
+        """
+        Bands in force for each of the given days
+
+        Args:
+            symbol: NSE symbol
+            days: Dates (or Timestamps) to look up
+            default: Band to use for days before the first known observation
+
+        Returns:
+            List of band percentages, one per day
+        """
+        self._ensure_loaded()
+        dates = self._dates.get(symbol)
+        if dates is None:
+            return [default for _ in days]
+
+        bands = self._bands[symbol]
+        result = []
+        for day in days:
+            day = day.date() if isinstance(day, datetime) else day
+            position = bisect.bisect_right(dates, day.toordinal())
+            result.append(bands[position - 1] if position > 0 else default)
+        return result
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._dates)
+
+
+def _same_band(a: float, b: float) -> bool:
+    """Band equality that treats two 'No Band' (NaN) values as equal"""
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return a == b
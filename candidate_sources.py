@@ -0,0 +1,221 @@
+"""
+Pluggable sources for the day's upper circuit candidate list, with hedging.
+
+The primary source (the live NSE API) can stall for a long time on retries
+and 403s. fetch_hedged() starts the primary, and if it hasn't produced a
+result after `hedge_delay` seconds, also starts the next source, and so on.
+The first non-empty result wins, the others are told to stop, and the whole
+fetch is bounded by `timeout`. Each source's outcome and latency is recorded
+so the run log shows which source answered and how long each one took.
+
+Sources:
+    NSELiveSource     - NSE price band hitter API (live session dance)
+    BhavcopySource    - today's local/downloaded bhavcopy checked against the
+                        precomputed circuit price table
+    ArchiveSource     - today's latest snapshot in the local NSE snapshot archive
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from circuit_table import CircuitPriceTable, download_bhavcopy, load_bhavcopy
+
+HEDGE_DELAY_SECONDS = 20.0
+CANDIDATE_TIMEOUT_SECONDS = 120.0
+
+
+class FetchCancelled(Exception):
+    """Raised inside a source when another source has already won"""
+
+
+class CandidateSource:
+    """
+    Base class for candidate sources
+
+    Subclasses implement fetch() and should check `cancel` (or call
+    `self.pause`) between slow steps so they can stop early.
+    """
+
+    name = "source"
+
+    def fetch(self, cancel: threading.Event) -> Optional[List[Dict]]:
+        """
+        Returns:
+            Candidate stock dicts (same shape as the NSE parser output), or None if unavailable
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def pause(cancel: threading.Event, seconds: float):
+        """Sleep that wakes up and raises FetchCancelled as soon as the fetch is cancelled"""
+        if cancel.wait(seconds):
+            raise FetchCancelled()
+
+
+class NSELiveSource(CandidateSource):
+    """
+    Live NSE price band hitter API
+
+    The raw payload is kept in `payload` rather than archived from the worker
+    thread; the caller persists it once the hedged fetch has settled.
+    """
+
+    name = "nse-live"
+
+    def __init__(self, finder):
+        self.finder = finder
+        self.payload: Optional[Dict] = None
+
+    def fetch(self, cancel: threading.Event) -> Optional[List[Dict]]:
+        def keep(data):
+            self.payload = data
+
+        # The finder reports every failure as an empty list
+        return self.finder.get_upper_circuit_stocks_from_nse(cancel=cancel, on_payload=keep) or None
+
+
+class BhavcopySource(CandidateSource):
+    """Session bhavcopy closes compared with the precomputed upper circuit prices"""
+
+    name = "bhavcopy"
+
+    def __init__(self, session: date):
+        self.session = session
+
+    def fetch(self, cancel: threading.Event) -> Optional[List[Dict]]:
+        table = CircuitPriceTable.load(self.session)
+        if table is None:
+            print(f"   ℹ️  [{self.name}] No circuit price table for {self.session}")
+            return None
+        path = download_bhavcopy(self.session)
+        if path is None or cancel.is_set():
+            return None
+
+        quotes = load_bhavcopy(path)
+        symbols = list(quotes)
+        closes = [quotes[symbol]["close"] for symbol in symbols]
+        hits, _ = table.at_upper_circuit(symbols, closes)
+
+        candidates = []
+        for symbol, hit in zip(symbols, hits):
+            if not hit:
+                continue
+            quote = quotes[symbol]
+            circuit = table.lookup(symbol)
+            prev_close = circuit["prev_close"]
+            candidates.append({
+                'symbol': symbol,
+                'pct_change': round((quote["close"] - prev_close) / prev_close * 100, 2),
+                'price_band': circuit["band"],
+                'ltp': quote["close"],
+                'high': quote["high"],
+                'low': quote["low"],
+                'open': 0,
+                'close': quote["close"],
+                'volume': quote["volume"],
+                'closeness': 0.0,
+            })
+        return candidates or None
+
+
+class ArchiveSource(CandidateSource):
+    """Latest archived NSE snapshot taken on the session date (e.g. by an earlier attempt)"""
+
+    name = "archive"
+
+    def __init__(self, finder, session: date):
+        self.finder = finder
+        self.session = session
+
+    def fetch(self, cancel: threading.Event) -> Optional[List[Dict]]:
+        stamp = self.session.isoformat()
+        record = self.finder.snapshot_archive.get(stamp)
+        if record is None or not record["timestamp"].startswith(stamp):
+            return None
+        print(f"   ℹ️  [{self.name}] Using archived snapshot from {record['timestamp']}")
+        return self.finder._parse_upper_circuit_stocks(record["data"], session_date=self.session) or None
+
+
+def fetch_hedged(sources: List[CandidateSource], hedge_delay: float = HEDGE_DELAY_SECONDS,
+                 timeout: float = CANDIDATE_TIMEOUT_SECONDS) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Run sources with hedging and return the first non-empty result
+
+    Sources are started in order: the next one starts once `hedge_delay` has
+    passed without a winner, or immediately when every started source has
+    come back empty.
+
+    Returns:
+        (candidates, report) - report has one entry per source with its
+        'status' and 'latency'. Only the source whose result was used is 'won';
+        a result that arrived alongside it is 'discarded'. Other statuses:
+        empty / failed / cancelled / not started
+    """
+    cancel = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="candidates")
+    start = time.monotonic()
+    deadline = start + timeout
+    report = {source.name: {'source': source.name, 'status': 'not started', 'latency': None} for source in sources}
+    running = {}
+    next_index = 0
+    next_launch = start
+    winner: List[Dict] = []
+
+    def run(source):
+        started = time.monotonic()
+        try:
+            result = source.fetch(cancel)
+            status = 'answered' if result else 'empty'
+        except FetchCancelled:
+            result, status = None, 'cancelled'
+        except Exception as e:
+            print(f"   ⚠ [{source.name}] failed: {e}")
+            result, status = None, 'failed'
+        return result, status, time.monotonic() - started
+
+    try:
+        while True:
+            now = time.monotonic()
+            # Start the next source when its hedge delay is up, or right away if nothing is left running
+            if next_index < len(sources) and (now >= next_launch or not running):
+                source = sources[next_index]
+                print(f"   🚦 Starting candidate source '{source.name}' (t+{now - start:.1f}s)")
+                running[executor.submit(run, source)] = source
+                report[source.name]['status'] = 'running'
+                next_index += 1
+                next_launch = now + hedge_delay
+                continue
+
+            if not running:
+                break  # Every source has answered without a result
+            if now >= deadline:
+                print(f"   ⏰ Candidate sources timed out after {timeout:.0f}s")
+                break
+
+            wake_at = deadline if next_index >= len(sources) else min(deadline, next_launch)
+            done, _ = wait(list(running), timeout=max(wake_at - now, 0), return_when=FIRST_COMPLETED)
+            # Sources that finish together are resolved in priority (list) order
+            for future in sorted(done, key=lambda future: sources.index(running[future])):
+                source = running.pop(future)
+                result, status, latency = future.result()
+                if status == 'answered':
+                    status = 'discarded' if winner else 'won'
+                    if status == 'won':
+                        winner = result
+                report[source.name].update(status=status, latency=latency)
+            if winner:
+                break
+    finally:
+        cancel.set()
+        for future, source in running.items():
+            if report[source.name]['status'] == 'running':
+                report[source.name].update(status='cancelled', latency=time.monotonic() - start)
+        # Don't wait for stragglers (e.g. an NSE request blocked on its socket timeout).
+        # They finish in the background and their results are discarded; executor
+        # threads are not daemons, so process exit still waits for them.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return winner, [report[source.name] for source in sources]
@@ -0,0 +1,292 @@
+"""
+Precomputed, tick-exact circuit prices for the next trading session.
+
+NSE derives each symbol's circuit prices from its previous close and price
+band, rounded to the symbol's tick size. The tick is fixed for a whole month
+from the symbol's close on the last trading day of the previous month - it
+does not follow the daily price, so a circuit price can sit above a tick
+boundary (e.g. 251.08 for a stock that closed the month below 250). With
+those prices known in advance,
+"is this stock at its upper circuit?" becomes an exact integer comparison
+of LTP against the table instead of a float `pChange` heuristic with a 1%
+slack.
+
+The table is built nightly from the session's bhavcopy (closing prices), the
+previous month-end bhavcopy (ticks) and the band history. Prices are stored as integer paise in numpy arrays indexed
+by an interned symbol id, so detecting circuits in a whole snapshot is one
+vectorized equality check.
+"""
+
+import os
+import io
+import sys
+import csv
+import zipfile
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from nse_http import download_file
+
+CIRCUIT_TABLE_DIR = os.path.join("data", "circuit_tables")
+BHAVCOPY_DIR = os.path.join("data", "bhavcopy")
+
+# NSE CM bhavcopy (UDiFF format) for one session
+BHAVCOPY_URL = "https://nsearchives.nseindia.com/content/cm/BhavCopy_NSE_CM_0_0_0_{stamp}_F_0000.csv.zip"
+
+# Series that carry price bands; when a symbol trades in several, EQ wins
+EQUITY_SERIES = ("EQ", "BE", "BZ", "SM", "ST")
+
+# NSE equity tick sizes by price (in paise), keyed by the exclusive upper price bound in rupees.
+# Applied to the month-end close to fix a symbol's tick for the following month.
+TICK_SIZE_SCHEDULE = (
+    (250, 1),
+    (1000, 5),
+    (5000, 10),
+    (10000, 50),
+    (20000, 100),
+    (float("inf"), 500),
+)
+
+
+def tick_size_paise(price: float) -> int:
+    """Tick size (in paise) for a month-end closing price in rupees"""
+    for bound, tick in TICK_SIZE_SCHEDULE:
+        if price < bound:
+            return tick
+    return TICK_SIZE_SCHEDULE[-1][1]
+
+
+def circuit_prices_paise(prev_close_paise: int, band: float, tick: int) -> Tuple[int, int]:
+    """
+    Tick-rounded (upper, lower) circuit prices in paise
+
+    The upper price is rounded down and the lower price rounded up to the tick,
+    so the circuit never exceeds the band percentage.
+
+    Args:
+        prev_close_paise: Previous session's close in paise
+        band: Price band percentage
+        tick: The symbol's tick for the month in paise (see ticks_from_month_end)
+    """
+    band_bp = int(round(band * 100))  # Integer basis points keep the arithmetic exact
+    upper = (prev_close_paise * (10000 + band_bp)) // (10000 * tick) * tick
+    lower = -((-prev_close_paise * (10000 - band_bp)) // (10000 * tick)) * tick
+    return upper, lower
+
+
+def ticks_from_month_end(month_end_closes: Dict[str, float]) -> Dict[str, int]:
+    """
+    Per-symbol ticks (paise) for a month, from the closes on the previous month's last trading day
+    """
+    return {symbol: tick_size_paise(close) for symbol, close in month_end_closes.items() if close > 0}
+
+
+def _to_float(value) -> float:
+    return float(str(value).replace(",", "").strip())
+
+
+def bhavcopy_path(session: date, bhavcopy_dir: str = BHAVCOPY_DIR) -> str:
+    return os.path.join(bhavcopy_dir, f"BhavCopy_NSE_CM_{session.strftime('%Y%m%d')}.csv.zip")
+
+
+def download_bhavcopy(session: date, bhavcopy_dir: str = BHAVCOPY_DIR) -> Optional[str]:
+    """
+    Download the NSE CM bhavcopy for a session into the local bhavcopy store
+
+    Returns:
+        Path of the stored zip, or None if NSE has not published it / refused the request
+    """
+    path = bhavcopy_path(session, bhavcopy_dir)
+    if os.path.exists(path):
+        return path
+
+    url = BHAVCOPY_URL.format(stamp=session.strftime("%Y%m%d"))
+    if not download_file(url, path, f"Bhavcopy for {session}", is_valid=lambda content: content.startswith(b"PK")):
+        return None
+    return path
+
+
+def load_bhavcopy(path: str) -> Dict[str, Dict]:
+    """
+    Read a bhavcopy (zipped or plain CSV; UDiFF or legacy column names)
+
+    Returns:
+        Mapping of symbol -> {'series', 'close', 'prev_close', 'high', 'low', 'ltp', 'volume'}
+    """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            text = archive.read(archive.namelist()[0]).decode("utf-8", errors="ignore")
+    else:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+
+    # UDiFF names first, then the legacy cmDDMMMYYYYbhav.csv names
+    aliases = {
+        "symbol": ("TckrSymb", "SYMBOL"),
+        "series": ("SctySrs", "SERIES"),
+        "close": ("ClsPric", "CLOSE"),
+        "prev_close": ("PrvsClsgPric", "PREVCLOSE"),
+        "high": ("HghPric", "HIGH"),
+        "low": ("LwPric", "LOW"),
+        "ltp": ("LastPric", "LAST"),
+        "volume": ("TtlTradgVol", "TOTTRDQTY"),
+    }
+    reader = csv.DictReader(io.StringIO(text))
+    fields = {name.strip(): name for name in (reader.fieldnames or [])}
+    columns = {key: next((fields[name] for name in names if name in fields), None) for key, names in aliases.items()}
+    if not columns["symbol"] or not columns["close"]:
+        return {}
+
+    quotes = {}
+    for row in reader:
+        series = (row.get(columns["series"]) or "EQ").strip() if columns["series"] else "EQ"
+        if series not in EQUITY_SERIES:
+            continue
+        symbol = row[columns["symbol"]].strip()
+        if symbol in quotes and quotes[symbol]["series"] == "EQ":
+            continue
+        try:
+            quote = {"series": series}
+            for key in ("close", "prev_close", "high", "low", "ltp", "volume"):
+                quote[key] = _to_float(row[columns[key]]) if columns[key] and row.get(columns[key]) else 0.0
+        except ValueError:
+            continue
+        quotes[symbol] = quote
+    return quotes
+
+
+class CircuitPriceTable:
+    """
+    Array-backed table of exact circuit prices for one session
+    """
+
+    def __init__(self, session: date, symbols: List[str], prev_close_paise, bands, tick_paise, upper_paise, lower_paise):
+        self.session = session
+        self.symbols = [sys.intern(symbol) for symbol in symbols]
+        self.ids: Dict[str, int] = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.prev_close_paise = np.asarray(prev_close_paise, dtype=np.int64)
+        self.bands = np.asarray(bands, dtype=np.float32)
+        self.tick_paise = np.asarray(tick_paise, dtype=np.int64)
+        self.upper_paise = np.asarray(upper_paise, dtype=np.int64)
+        self.lower_paise = np.asarray(lower_paise, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @classmethod
+    def build(cls, session: date, prev_closes: Dict[str, float], bands: Dict[str, float],
+              ticks: Dict[str, int]) -> "CircuitPriceTable":
+        """
+        Compute circuit prices for a session
+
+        Args:
+            session: The session the circuits apply to
+            prev_closes: symbol -> previous session's close (rupees)
+            bands: symbol -> band percentage in force for the session; symbols
+                   without a band (or with 'No Band' = NaN) are left out
+            ticks: symbol -> tick in paise for the session's month; symbols
+                   without a known tick (e.g. listed this month) are left out
+        """
+        symbols, closes, band_values, tick_values, uppers, lowers = [], [], [], [], [], []
+        for symbol in sorted(prev_closes):
+            band = bands.get(symbol)
+            tick = ticks.get(symbol)
+            close = prev_closes[symbol]
+            if band is None or np.isnan(band) or band <= 0 or close <= 0 or not tick:
+                continue
+            close_paise = int(round(close * 100))
+            upper, lower = circuit_prices_paise(close_paise, band, tick)
+            symbols.append(symbol)
+            closes.append(close_paise)
+            band_values.append(band)
+            tick_values.append(tick)
+            uppers.append(upper)
+            lowers.append(lower)
+        return cls(session, symbols, closes, band_values, tick_values, uppers, lowers)
+
+    @staticmethod
+    def path_for(session: date, table_dir: str = CIRCUIT_TABLE_DIR) -> str:
+        return os.path.join(table_dir, f"circuit_{session.strftime('%Y%m%d')}.npz")
+
+    def save(self, table_dir: str = CIRCUIT_TABLE_DIR) -> str:
+        os.makedirs(table_dir, exist_ok=True)
+        path = self.path_for(self.session, table_dir)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            session=np.array(self.session.isoformat()),
+            symbols=np.array(self.symbols),
+            prev_close_paise=self.prev_close_paise,
+            bands=self.bands,
+            tick_paise=self.tick_paise,
+            upper_paise=self.upper_paise,
+            lower_paise=self.lower_paise,
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, session: date, table_dir: str = CIRCUIT_TABLE_DIR) -> Optional["CircuitPriceTable"]:
+        """Load the table for a session, or None if it was never precomputed"""
+        path = cls.path_for(session, table_dir)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if "tick_paise" not in data.files:
+                return None  # Built before per-symbol ticks; its prices can be off the symbol's tick grid
+            return cls(session, data["symbols"].tolist(), data["prev_close_paise"], data["bands"],
+                       data["tick_paise"], data["upper_paise"], data["lower_paise"])
+
+    def lookup(self, symbol: str) -> Optional[Dict]:
+        """Circuit prices (in rupees) for one symbol"""
+        i = self.ids.get(symbol)
+        if i is None:
+            return None
+        return {
+            "prev_close": int(self.prev_close_paise[i]) / 100,
+            "band": float(self.bands[i]),
+            "tick": int(self.tick_paise[i]) / 100,
+            "upper": int(self.upper_paise[i]) / 100,
+            "lower": int(self.lower_paise[i]) / 100,
+        }
+
+    def _resolve(self, symbols: Iterable[str], prices: Iterable[float], bands: Optional[Iterable[float]] = None):
+        ids = np.fromiter((self.ids.get(symbol, -1) for symbol in symbols), dtype=np.int64)
+        price_paise = np.rint(np.asarray(list(prices), dtype=np.float64) * 100).astype(np.int64)
+        known = ids >= 0
+        ids = np.where(known, ids, 0)
+        if len(self) == 0:
+            return ids, price_paise, np.zeros(len(ids), dtype=bool)
+        if bands is not None:
+            # A band revised since the table was built makes its prices wrong for that symbol
+            known &= np.asarray(list(bands), dtype=np.float32) == self.bands[ids]
+        return ids, price_paise, known
+
+    def at_upper_circuit(self, symbols: Iterable[str], ltps: Iterable[float],
+                         bands: Optional[Iterable[float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized exact upper-circuit check
+
+        Args:
+            symbols: NSE symbols
+            ltps: Prices to check, in rupees
+            bands: Optional live band per symbol; symbols whose band differs from
+                   the table's (or is NaN) are reported as unknown
+
+        Returns:
+            (hits, known): boolean arrays; `known` is False for symbols not in the table
+        """
+        ids, ltp_paise, known = self._resolve(symbols, ltps, bands)
+        if len(self) == 0:
+            return known, known
+        return known & (ltp_paise == self.upper_paise[ids]), known
+
+    def at_lower_circuit(self, symbols: Iterable[str], ltps: Iterable[float],
+                         bands: Optional[Iterable[float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized exact lower-circuit check (see at_upper_circuit)"""
+        ids, ltp_paise, known = self._resolve(symbols, ltps, bands)
+        if len(self) == 0:
+            return known, known
+        return known & (ltp_paise == self.lower_paise[ids]), known
@@ -0,0 +1,49 @@
+"""
+Shared HTTP helpers for NSE's archive files (bhavcopies, band files).
+"""
+
+import os
+from typing import Callable, Optional
+
+import requests
+
+# Browser user agent sent to NSE; its archives refuse the default python-requests agent
+NSE_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+
+
+def download_file(url: str, path: str, label: str, is_valid: Optional[Callable[[bytes], bool]] = None,
+                  timeout: float = 30) -> bool:
+    """
+    Download a file from NSE and store it atomically (temp file + rename)
+
+    Args:
+        url: File URL
+        path: Destination path; its directory is created if needed
+        label: Human-readable name for log messages (e.g. 'Bhavcopy for 2026-08-05')
+        is_valid: Optional check on the response body (NSE serves HTML error pages with 200)
+        timeout: Request timeout in seconds
+
+    Returns:
+        True if the file was downloaded and saved
+    """
+    try:
+        response = requests.get(url, timeout=timeout, headers={
+            'User-Agent': NSE_USER_AGENT,
+            'Accept': '*/*',
+        })
+    except requests.RequestException as e:
+        print(f"   ⚠️  {label} download failed: {e}")
+        return False
+    if response.status_code != 200 or (is_valid is not None and not is_valid(response.content)):
+        print(f"   ⚠️  {label} not available (HTTP {response.status_code})")
+        return False
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(response.content)
+    os.replace(tmp_path, path)
+    print(f"   💾 {label} saved to {path}")
+    return True
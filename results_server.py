@@ -0,0 +1,243 @@
+"""
+Local JSON API over the scan results in csv/.
+
+Serves the latest scan, any date and per-symbol history as typed JSON
+(no '₹'/'%' strings). All response bodies and their ETags are prebuilt in
+memory and rebuilt only when a CSV file is added or changed, so a request
+costs a dict lookup plus a socket write. Clients can poll with
+If-None-Match and get 304 Not Modified until new results land.
+
+Endpoints:
+    GET /                 - endpoint list and dataset version
+    GET /latest           - results of the most recent scan
+    GET /dates            - all scan dates with result counts
+    GET /date/<date>      - results for one date (YYYY-MM-DD or YYYYMMDD)
+    GET /symbol/<SYMBOL>  - every appearance of a symbol, oldest first
+"""
+
+import os
+import csv
+import json
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+CSV_DIR = "csv"
+CSV_PREFIX = "upper_circuit_stocks_"
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# Check the csv/ directory for new files at most this often
+RELOAD_CHECK_SECONDS = 1.0
+
+
+def _parse_number(value: str) -> Optional[float]:
+    """Parse '₹1,234.50', '19.99%', '1,234' or '₹1,234 Cr' into a float"""
+    text = (value or "").replace("₹", "").replace(",", "").replace("%", "").replace("Cr", "").strip()
+    if not text or text.upper() == "N/A":
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_result_row(row: Dict[str, str]) -> Dict:
+    """Convert a CSV result row into typed JSON fields"""
+    volume = _parse_number(row.get("Volume", ""))
+    return {
+        "symbol": row.get("Symbol", ""),
+        "company_name": row.get("Company Name", ""),
+        "date": row.get("Date", ""),
+        "open": _parse_number(row.get("Open", "")),
+        "close": _parse_number(row.get("Close", "")),
+        "high": _parse_number(row.get("High", "")),
+        "low": _parse_number(row.get("Low", "")),
+        "change_pct": _parse_number(row.get("Change %", "")),
+        "circuit_limit_pct": _parse_number(row.get("Circuit Limit", "")),
+        "market_cap_cr": _parse_number(row.get("Market Cap", "")),
+        "volume": int(volume) if volume is not None else None,
+    }
+
+
+class ResultsCache:
+    """
+    In-memory cache of prebuilt JSON responses, reloaded when csv/ changes
+    """
+
+    def __init__(self, csv_dir: str = CSV_DIR):
+        self.csv_dir = csv_dir
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[Tuple[int, int], List[Dict]]] = {}  # filename -> ((mtime, size), rows)
+        self._responses: Dict[str, Tuple[bytes, str]] = {}  # path -> (body, etag)
+        self._signature = None
+        self._last_check = 0.0
+        self.version = ""
+        self.refresh(force=True)
+
+    def _scan_directory(self) -> Dict[str, Tuple[int, int]]:
+        stats = {}
+        if not os.path.isdir(self.csv_dir):
+            return stats
+        for entry in os.scandir(self.csv_dir):
+            if entry.name.startswith(CSV_PREFIX) and entry.name.endswith(".csv"):
+                stat = entry.stat()
+                stats[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def refresh(self, force: bool = False):
+        """Reload changed CSV files (throttled to one directory scan per RELOAD_CHECK_SECONDS)"""
+        now = time.monotonic()
+        if not force and now - self._last_check < RELOAD_CHECK_SECONDS:
+            return
+
+        with self._lock:
+            if not force and now - self._last_check < RELOAD_CHECK_SECONDS:
+                return
+            self._last_check = now
+
+            stats = self._scan_directory()
+            signature = tuple(sorted(stats.items()))
+            if signature == self._signature:
+                return
+
+            # Only re-parse files that are new or changed
+            files = {}
+            for filename, stat in stats.items():
+                cached = self._files.get(filename)
+                if cached and cached[0] == stat:
+                    files[filename] = cached
+                else:
+                    files[filename] = (stat, self._read_csv(os.path.join(self.csv_dir, filename)))
+
+            self._files = files
+            self._signature = signature
+            self._responses = self._build_responses(files)
+            print(f"   🔄 Results cache loaded: {len(files)} scan file(s), version {self.version}")
+
+    @staticmethod
+    def _read_csv(path: str) -> List[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                return [parse_result_row(row) for row in csv.DictReader(f)]
+        except (OSError, csv.Error) as e:
+            print(f"   ⚠️  Could not read {path}: {e}")
+            return []
+
+    def _build_responses(self, files: Dict) -> Dict[str, Tuple[bytes, str]]:
+        """Prebuild every response body and its ETag"""
+        by_date: Dict[str, List[Dict]] = {}
+        for filename, (_, rows) in files.items():
+            stamp = filename[len(CSV_PREFIX):-len(".csv")]
+            if len(stamp) == 8 and stamp.isdigit():
+                by_date[f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:]}"] = rows
+
+        dates = sorted(by_date)
+        self.version = hashlib.sha1(repr(self._signature).encode("utf-8")).hexdigest()[:12]
+
+        payloads = {
+            "/": {
+                "version": self.version,
+                "endpoints": ["/latest", "/dates", "/date/<YYYY-MM-DD>", "/symbol/<SYMBOL>"],
+            },
+            "/dates": {
+                "dates": [{"date": day, "count": len(by_date[day])} for day in dates],
+            },
+        }
+        if dates:
+            latest = dates[-1]
+            payloads["/latest"] = {"date": latest, "count": len(by_date[latest]), "results": by_date[latest]}
+        else:
+            payloads["/latest"] = {"date": None, "count": 0, "results": []}
+
+        history: Dict[str, List[Dict]] = {}
+        for day in dates:
+            payloads[f"/date/{day}"] = {"date": day, "count": len(by_date[day]), "results": by_date[day]}
+            for row in by_date[day]:
+                history.setdefault(row["symbol"].upper(), []).append(row)
+        for symbol, rows in history.items():
+            payloads[f"/symbol/{symbol}"] = {"symbol": symbol, "count": len(rows), "history": rows}
+
+        responses = {}
+        for path, payload in payloads.items():
+            body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            responses[path] = (body, f'"{hashlib.sha1(body).hexdigest()[:16]}"')
+        return responses
+
+    def get(self, path: str) -> Optional[Tuple[bytes, str]]:
+        """Look up a prebuilt response by normalized request path"""
+        return self._responses.get(normalize_path(path))
+
+
+def normalize_path(path: str) -> str:
+    """Strip query/trailing slash, percent-decode, and canonicalize date and symbol segments"""
+    path = unquote(path.split("?", 1)[0]).rstrip("/") or "/"
+    if path.startswith("/date/"):
+        stamp = path[len("/date/"):].replace("-", "")
+        if len(stamp) == 8 and stamp.isdigit():
+            return f"/date/{stamp[:4]}-{stamp[4:6]}-{stamp[6:]}"
+    elif path.startswith("/symbol/"):
+        return "/symbol/" + path[len("/symbol/"):].upper()
+    return path
+
+
+class ResultsRequestHandler(BaseHTTPRequestHandler):
+    """GET-only JSON handler backed by a shared ResultsCache"""
+
+    cache: ResultsCache = None
+    server_version = "UpperCircuitFinder"
+    protocol_version = "HTTP/1.1"  # Keep-alive for polling clients
+
+    def do_GET(self):
+        self.cache.refresh()
+        response = self.cache.get(self.path)
+        if response is None:
+            body = json.dumps({"error": "not found", "path": self.path}).encode("utf-8")
+            self._send(404, body)
+            return
+
+        body, etag = response
+        if etag in (self.headers.get("If-None-Match") or ""):
+            self._send(304, b"", etag)
+            return
+        self._send(200, body, etag)
+
+    def _send(self, status: int, body: bytes, etag: Optional[str] = None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request logging to stderr would dominate the response time
+        pass
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, csv_dir: str = CSV_DIR):
+    """
+    Run the results API server until interrupted
+
+    Args:
+        host: Interface to bind
+        port: TCP port
+        csv_dir: Directory containing upper_circuit_stocks_<YYYYMMDD>.csv files
+    """
+    ResultsRequestHandler.cache = ResultsCache(csv_dir)
+    server = ThreadingHTTPServer((host, port), ResultsRequestHandler)
+    print(f"🌐 Serving scan results on http://{host}:{port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping results server")
+    finally:
+        server.server_close()
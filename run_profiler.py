@@ -0,0 +1,146 @@
+"""
+Per-run CPU and memory profiling (enabled with --profile).
+
+Each profiled stage (scan_stocks, display_results, create_github_issue)
+produces, under profiles/<run timestamp>/:
+
+    <stage>.pstats             - cProfile stats (open with snakeviz / pstats)
+    <stage>_functions.txt      - top functions by cumulative time
+    <stage>.collapsed          - wall-clock stack samples of all threads in
+                                 collapsed-stack format (flamegraph.pl, speedscope)
+    <stage>_allocations.txt    - top tracemalloc allocation growth and peak
+
+cProfile measures CPU work in the main thread. The stack sampler records
+where every thread spends wall time, including time blocked in socket
+reads, so yfinance/pandas overhead can be told apart from waiting on NSE
+or Yahoo.
+"""
+
+import os
+import sys
+import io
+import time
+import cProfile
+import pstats
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Tuple
+
+PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL_SECONDS = 0.005
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+
+class _StackSampler:
+    """Background thread that samples the stacks of all other threads"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write_collapsed(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RunProfiler:
+    """
+    Wraps run stages in cProfile, a stack sampler and tracemalloc snapshots
+    """
+
+    def __init__(self, output_dir: str = PROFILE_DIR, sample_interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.output_dir = os.path.join(output_dir, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        self.sample_interval = sample_interval
+        self.summary: List[Tuple[str, float, float, int]] = []  # (stage, wall s, cpu s, peak bytes)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Profile everything run inside the with-block as one stage"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+        profiler = cProfile.Profile()
+        sampler = _StackSampler(self.sample_interval)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        sampler.start()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            sampler.stop()
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+
+            try:
+                self._write_stage(name, profiler, sampler, before, after, peak)
+                self.summary.append((name, wall, cpu, peak))
+                print(f"   ⏱️  [profile] {name}: {wall:.2f}s wall, {cpu:.2f}s CPU, peak {peak / 1e6:.1f} MB traced")
+            except Exception as e:
+                print(f"   ⚠️  Could not write profile for {name}: {e}")
+
+    def _write_stage(self, name, profiler, sampler, before, after, peak):
+        base = os.path.join(self.output_dir, name)
+        profiler.dump_stats(f"{base}.pstats")
+
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        with open(f"{base}_functions.txt", "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+
+        sampler.write_collapsed(f"{base}.collapsed")
+
+        # Leave out tracemalloc's and the profiler's own bookkeeping
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        growth = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+        with open(f"{base}_allocations.txt", "w", encoding="utf-8") as f:
+            f.write(f"Peak traced memory during {name}: {peak / 1e6:.2f} MB\n\n")
+            f.write(f"Top {TOP_ALLOCATIONS} allocation sites by growth:\n")
+            for stat in growth[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+
+    def write_summary(self):
+        """Write summary.txt with wall/CPU time and peak memory per stage"""
+        if not self.summary:
+            return
+        path = os.path.join(self.output_dir, "summary.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"{'stage':<24}{'wall s':>10}{'cpu s':>10}{'wait s':>10}{'peak MB':>10}\n")
+            for name, wall, cpu, peak in self.summary:
+                f.write(f"{name:<24}{wall:>10.2f}{cpu:>10.2f}{max(wall - cpu, 0):>10.2f}{peak / 1e6:>10.1f}\n")
+        print(f"\n📈 Profiles written to {self.output_dir}/")
@@ -0,0 +1,161 @@
+"""
+Write-ahead journal for a single scan date.
+
+The journal is a JSON-lines file that records the candidate list fetched
+from NSE and every per-symbol verdict as soon as it is known. A run that is
+interrupted (Actions timeout, NSE/Yahoo stall) can be restarted for the same
+date and will replay the journal instead of starting from zero.
+
+Writes are flushed on every record and fsync'ed in small batches, so at most
+the last few verdicts of a crashed run need to be recomputed. A torn trailing
+line from a crash mid-write is discarded on replay.
+
+Only unfinished journals are resumed. A journal whose scan completed is moved
+aside to scan_YYYYMMDD.previous.jsonl, and a later run on the same date starts
+a fresh scan.
+"""
+
+import os
+import json
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+JOURNAL_DIR = os.path.join("data", "journal")
+
+# fsync after this many records or this many seconds, whichever comes first
+FSYNC_EVERY_RECORDS = 5
+FSYNC_EVERY_SECONDS = 2.0
+
+
+class ScanJournal:
+    """
+    Per-run checkpoint journal keyed by scan date
+    """
+
+    def __init__(self, scan_date: date, journal_dir: str = JOURNAL_DIR):
+        self.scan_date = scan_date
+        self.journal_dir = journal_dir
+        self.path = os.path.join(journal_dir, f"scan_{scan_date.strftime('%Y%m%d')}.jsonl")
+        self.previous_path = os.path.join(journal_dir, f"scan_{scan_date.strftime('%Y%m%d')}.previous.jsonl")
+
+        self.candidates: Optional[List[Dict]] = None
+        # symbol -> {'hit': bool, 'row': result row or None, 'details': True once name/market cap are filled in}
+        self.verdicts: Dict[str, Dict] = {}
+        self.completed = False
+
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._replay()
+
+        # True if an earlier run on this date finished and was rotated out
+        self.rotated = False
+        if self.completed:
+            os.replace(self.path, self.previous_path)
+            self.candidates = None
+            self.verdicts = {}
+            self.completed = False
+            self.rotated = True
+
+    def _replay(self):
+        """Rebuild state from an existing journal, dropping a torn trailing line"""
+        if not os.path.exists(self.path):
+            return
+
+        good_bytes = 0
+        with open(self.path, "rb") as f:
+            for raw_line in f:
+                if not raw_line.endswith(b"\n"):
+                    break  # Incomplete write - everything before it is still valid
+                try:
+                    record = json.loads(raw_line)
+                except ValueError:
+                    break
+                self._apply(record)
+                good_bytes += len(raw_line)
+
+        if good_bytes < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good_bytes)
+
+    def _apply(self, record: Dict):
+        kind = record.get("type")
+        if kind == "candidates":
+            self.candidates = record["stocks"]
+        elif kind == "verdict":
+            self.verdicts[record["symbol"]] = {"hit": record["hit"], "row": record.get("row"), "details": False}
+        elif kind == "details":
+            verdict = self.verdicts.get(record["symbol"])
+            if verdict and verdict["row"]:
+                verdict["row"]["Company Name"] = record["company_name"]
+                verdict["row"]["Market Cap"] = record["market_cap"]
+                verdict["details"] = True
+        elif kind == "complete":
+            self.completed = True
+
+    @property
+    def resumed(self) -> bool:
+        """True if this journal had an unfinished scan's progress when it was opened"""
+        return self.candidates is not None
+
+    def _write(self, record: Dict):
+        if self._file is None:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= FSYNC_EVERY_RECORDS or time.monotonic() - self._last_sync >= FSYNC_EVERY_SECONDS:
+            self.sync()
+
+    def sync(self):
+        """Force buffered records to disk"""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def record_candidates(self, stocks: List[Dict], source: Optional[str] = None):
+        """Record the candidate list and the source it came from (synced immediately)"""
+        self.candidates = stocks
+        self._write({"type": "candidates", "source": source, "stocks": stocks})
+        self.sync()
+
+    def record_verdict(self, symbol: str, hit: bool, row: Optional[Dict] = None):
+        """
+        Record the 14-day verdict for a symbol
+
+        Args:
+            symbol: NSE symbol
+            hit: True if the symbol hit a circuit in the lookback window
+            row: The result row if the symbol qualified
+        """
+        self.verdicts[symbol] = {"hit": hit, "row": row, "details": False}
+        self._write({"type": "verdict", "symbol": symbol, "hit": hit, "row": row})
+
+    def record_details(self, symbol: str, details: Dict):
+        """Record the company name / market cap fetched for a qualifying symbol"""
+        verdict = self.verdicts.get(symbol)
+        if verdict is not None:
+            verdict["details"] = True
+        self._write({
+            "type": "details",
+            "symbol": symbol,
+            "company_name": details["company_name"],
+            "market_cap": details["market_cap"],
+        })
+
+    def record_complete(self):
+        """Mark the scan as finished"""
+        self.completed = True
+        self._write({"type": "complete"})
+        self.sync()
+
+    def close(self):
+        """Sync and close the journal file"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
@@ -0,0 +1,190 @@
+"""
+Append-only archive of raw NSE price band hitter responses.
+
+Every snapshot is stored as its own zstd frame holding one JSON line, appended
+to a single archive file. Concatenated zstd frames are still a valid zstd
+stream, so the whole archive can be decompressed in one go with `zstd -d`,
+but a small sidecar index (timestamp -> byte offset, length) lets us jump
+straight to any snapshot without decompressing everything before it.
+"""
+
+import os
+import json
+import bisect
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard as zstd
+except ImportError:  # Archiving is optional - the scan must still run without it
+    zstd = None
+
+# Default archive location (relative to the repo root)
+ARCHIVE_DIR = os.path.join("data", "archive")
+ARCHIVE_NAME = "nse_price_band"
+
+# zstd level 10 is a good size/speed trade-off for ~100 KB JSON payloads
+ZSTD_LEVEL = 10
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class SnapshotArchive:
+    """
+    Append-only, zstd-compressed JSON-lines archive with a seek index.
+
+    Files:
+        <name>.jsonl.zst  - concatenated zstd frames, one JSON record per frame
+        <name>.idx        - one line per snapshot: "<timestamp> <offset> <length>"
+    """
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR, name: str = ARCHIVE_NAME):
+        self.archive_dir = archive_dir
+        self.data_path = os.path.join(archive_dir, f"{name}.jsonl.zst")
+        self.index_path = os.path.join(archive_dir, f"{name}.idx")
+        self._index: Optional[List[Tuple[str, int, int]]] = None
+
+    @property
+    def available(self) -> bool:
+        """True if the zstandard module is installed"""
+        return zstd is not None
+
+    def _load_index(self) -> List[Tuple[str, int, int]]:
+        """Read the sidecar index (cached after the first call)"""
+        if self._index is not None:
+            return self._index
+
+        entries = []
+        if os.path.exists(self.index_path):
+            data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if not line.endswith("\n") or len(parts) != 3:
+                        continue  # Torn line from an interrupted write
+                    try:
+                        offset, length = int(parts[1]), int(parts[2])
+                    except ValueError:
+                        continue
+                    if offset + length > data_size:
+                        continue  # Points past the end of the data file
+                    entries.append((parts[0], offset, length))
+        # Appends are chronological, but keep the invariant explicit for bisect
+        entries.sort(key=lambda entry: entry[0])
+        self._index = entries
+        return entries
+
+    def _repair_index_tail(self):
+        """Truncate a torn (newline-less) last index line so the next entry starts on a fresh line"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            f.seek(0)
+            content = f.read()
+            f.truncate(content.rfind(b"\n") + 1)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, payload: Dict, timestamp: Optional[datetime] = None) -> Optional[str]:
+        """
+        Append a raw NSE payload to the archive
+
+        Args:
+            payload: Decoded JSON response from the NSE API
+            timestamp: Snapshot time (defaults to now)
+
+        Returns:
+            The timestamp key the snapshot was stored under, or None if zstandard is missing
+        """
+        if zstd is None:
+            return None
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        key = (timestamp or datetime.now()).strftime(TIMESTAMP_FORMAT)
+        record = json.dumps({"timestamp": key, "data": payload}, separators=(",", ":"))
+        frame = zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(record.encode("utf-8") + b"\n")
+
+        # Write the frame first and only then index it, so a crash can at worst
+        # leave unreferenced bytes at the end of the data file - never a bad index entry
+        with open(self.data_path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(frame)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._repair_index_tail()
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(f"{key} {offset} {len(frame)}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        if self._index is not None:
+            bisect.insort(self._index, (key, offset, len(frame)))
+        return key
+
+    def timestamps(self) -> List[str]:
+        """All snapshot timestamps in chronological order"""
+        return [entry[0] for entry in self._load_index()]
+
+    def _read_entry(self, entry: Tuple[str, int, int]) -> Dict:
+        """Seek to a single frame and decompress only that frame"""
+        _, offset, length = entry
+        with open(self.data_path, "rb") as f:
+            f.seek(offset)
+            frame = f.read(length)
+        record = json.loads(zstd.ZstdDecompressor().decompress(frame))
+        return record
+
+    def get(self, timestamp: str) -> Optional[Dict]:
+        """
+        Get the latest snapshot taken at or before the given timestamp
+
+        Args:
+            timestamp: ISO timestamp or date prefix (e.g. '2026-08-05' or '2026-08-05T20:00:00')
+
+        Returns:
+            Record dict with 'timestamp' and 'data' keys, or None if nothing matches
+        """
+        if zstd is None:
+            return None
+
+        index = self._load_index()
+        # A bare date means "end of that day"
+        if "T" not in timestamp:
+            timestamp = f"{timestamp}T23:59:59"
+        position = bisect.bisect_right(index, (timestamp, float("inf"), 0))
+        if position == 0:
+            return None
+        return self._read_entry(index[position - 1])
+
+    def iter_snapshots(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Iterate over snapshots in [start, end], seeking directly to the first one
+
+        Args:
+            start: Inclusive lower bound (ISO timestamp or date), None for the beginning
+            end: Inclusive upper bound (ISO timestamp or date), None for the end
+        """
+        if zstd is None:
+            return
+
+        index = self._load_index()
+        lo = bisect.bisect_left(index, (start, -1, 0)) if start else 0
+        if end and "T" not in end:
+            end = f"{end}T23:59:59"
+        hi = bisect.bisect_right(index, (end, float("inf"), 0)) if end else len(index)
+
+        if lo >= hi:
+            return
+
+        decompressor = zstd.ZstdDecompressor()
+        with open(self.data_path, "rb") as f:
+            for _, offset, length in index[lo:hi]:
+                f.seek(offset)
+                yield json.loads(decompressor.decompress(f.read(length)))
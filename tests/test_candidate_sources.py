@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from candidate_sources import CandidateSource, FetchCancelled, fetch_hedged
+
+
+class StubSource(CandidateSource):
+    """Returns `result` after `delay` seconds; waits are cancellable like the real sources"""
+
+    def __init__(self, name, result=None, delay=0.0, error=None):
+        self.name = name
+        self.result = result
+        self.delay = delay
+        self.error = error
+        self.started_at = None
+        self.cancelled = threading.Event()
+
+    def fetch(self, cancel):
+        self.started_at = time.monotonic()
+        try:
+            self.pause(cancel, self.delay)
+        except FetchCancelled:
+            self.cancelled.set()
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def statuses(report):
+    return {entry['source']: entry['status'] for entry in report}
+
+
+def test_secondary_starts_after_hedge_delay_and_wins():
+    primary = StubSource("primary", [{'symbol': 'P'}], delay=5)
+    secondary = StubSource("secondary", [{'symbol': 'S'}], delay=0.05)
+    start = time.monotonic()
+    candidates, report = fetch_hedged([primary, secondary], hedge_delay=0.2, timeout=5)
+
+    assert candidates == [{'symbol': 'S'}]
+    assert statuses(report) == {"primary": "cancelled", "secondary": "won"}
+    assert secondary.started_at - primary.started_at >= 0.2
+    assert time.monotonic() - start < 1
+
+
+def test_primary_answering_first_never_starts_the_hedge():
+    primary = StubSource("primary", [{'symbol': 'P'}], delay=0.05)
+    secondary = StubSource("secondary", [{'symbol': 'S'}])
+    candidates, report = fetch_hedged([primary, secondary], hedge_delay=1, timeout=5)
+
+    assert candidates == [{'symbol': 'P'}]
+    assert statuses(report) == {"primary": "won", "secondary": "not started"}
+    assert secondary.started_at is None
+
+
+def test_empty_or_failed_source_hands_over_immediately():
+    sources = [
+        StubSource("failing", error=RuntimeError("boom")),
+        StubSource("empty", None),
+        StubSource("last", [{'symbol': 'L'}]),
+    ]
+    start = time.monotonic()
+    candidates, report = fetch_hedged(sources, hedge_delay=10, timeout=30)
+
+    assert candidates == [{'symbol': 'L'}]
+    assert statuses(report) == {"failing": "failed", "empty": "empty", "last": "won"}
+    assert time.monotonic() - start < 1
+
+
+def test_timeout_bounds_the_fetch_and_cancels_running_sources():
+    sources = [StubSource("a", [{'symbol': 'A'}], delay=5), StubSource("b", [{'symbol': 'B'}], delay=5)]
+    start = time.monotonic()
+    candidates, report = fetch_hedged(sources, hedge_delay=0.1, timeout=0.3)
+
+    assert candidates == []
+    assert time.monotonic() - start < 1
+    assert statuses(report) == {"a": "cancelled", "b": "cancelled"}
+    for source in sources:
+        assert source.cancelled.wait(1), f"{source.name} was not told to stop"
+
+
+def test_losing_source_is_cancelled_once_a_winner_is_picked():
+    slow = StubSource("slow", [{'symbol': 'X'}], delay=5)
+    fast = StubSource("fast", [{'symbol': 'F'}])
+    fetch_hedged([slow, fast], hedge_delay=0.05, timeout=5)
+    assert slow.cancelled.wait(1)
+
+
+def test_only_the_adopted_result_is_won():
+    # With no hedge delay both sources run at once; whichever result is used must be the only 'won'
+    for _ in range(20):
+        sources = [StubSource("a", [{'symbol': 'A'}], delay=0.02), StubSource("b", [{'symbol': 'B'}], delay=0.02)]
+        candidates, report = fetch_hedged(sources, hedge_delay=0, timeout=5)
+        won = [entry['source'] for entry in report if entry['status'] == 'won']
+        assert len(won) == 1
+        assert candidates == [{'symbol': won[0].upper()}]
+        assert all(entry['status'] in ('won', 'discarded', 'cancelled') for entry in report)
+
+
+def test_nothing_found_returns_empty_list():
+    candidates, report = fetch_hedged([StubSource("a"), StubSource("b")], hedge_delay=10, timeout=5)
+    assert candidates == []
+    assert statuses(report) == {"a": "empty", "b": "empty"}
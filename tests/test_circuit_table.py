@@ -0,0 +1,102 @@
+import os
+import sys
+import random
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_table import CircuitPriceTable, circuit_prices_paise, tick_size_paise, ticks_from_month_end
+
+
+def test_upper_rounds_down_and_lower_rounds_up():
+    # 100.01 * 1.05 = 105.0105 and 100.01 * 0.95 = 95.0095 on a 0.05 tick
+    assert circuit_prices_paise(10001, 5, 5) == (10500, 9505)
+    # Exact multiples are left as they are
+    assert circuit_prices_paise(10000, 5, 5) == (10500, 9500)
+
+
+def test_circuit_never_exceeds_band():
+    rng = random.Random(7)
+    for _ in range(2000):
+        prev_close = rng.randint(100, 3_000_000)
+        band = rng.choice((2, 5, 10, 20))
+        tick = rng.choice((1, 5, 10, 50, 100, 500))
+        upper, lower = circuit_prices_paise(prev_close, band, tick)
+        assert upper % tick == 0 and lower % tick == 0
+        assert upper * 100 <= prev_close * (100 + band) < (upper + tick) * 100
+        assert (lower - tick) * 100 < prev_close * (100 - band) <= lower * 100
+
+
+def test_circuit_crossing_250_uses_the_month_tick():
+    # 239.13 +/- 5% crosses 250; the grid is the symbol's month tick, not the price's bucket
+    assert circuit_prices_paise(23913, 5, 1) == (25108, 22718)
+    assert circuit_prices_paise(23913, 5, 5) == (25105, 22720)
+
+
+def test_circuit_crossing_1000_uses_the_month_tick():
+    # 955.00 * 1.05 = 1002.75
+    assert circuit_prices_paise(95500, 5, 5) == (100275, 90725)
+    assert circuit_prices_paise(95500, 5, 10) == (100270, 90730)
+
+
+def test_ticks_from_month_end_boundaries():
+    ticks = ticks_from_month_end({
+        "A": 249.99, "B": 250.0, "C": 999.95, "D": 1000.0,
+        "E": 4999.9, "F": 5000.0, "G": 10000.0, "H": 20000.0, "Z": 0.0,
+    })
+    assert ticks == {"A": 1, "B": 5, "C": 5, "D": 10, "E": 10, "F": 50, "G": 100, "H": 500}
+    assert tick_size_paise(249.99) == 1
+
+
+def test_table_uses_per_symbol_ticks(tmp_path):
+    session = date(2026, 8, 3)
+    table = CircuitPriceTable.build(
+        session,
+        prev_closes={"LOW": 239.13, "HIGH": 239.13, "NEW": 239.13},
+        bands={"LOW": 5, "HIGH": 5, "NEW": 5},
+        ticks={"LOW": 1, "HIGH": 5},
+    )
+    assert table.symbols == ["HIGH", "LOW"]  # No tick known for NEW
+    assert table.lookup("LOW")["upper"] == 251.08
+    assert table.lookup("HIGH")["upper"] == 251.05
+
+    hits, known = table.at_upper_circuit(["LOW", "HIGH", "NEW"], [251.08, 251.08, 251.08])
+    assert hits.tolist() == [True, False, False]
+    assert known.tolist() == [True, True, False]
+
+    table.save(str(tmp_path))
+    loaded = CircuitPriceTable.load(session, str(tmp_path))
+    assert loaded.tick_paise.tolist() == [5, 1]
+    assert loaded.upper_paise.tolist() == table.upper_paise.tolist()
+
+
+def test_table_without_ticks_is_not_loaded(tmp_path):
+    session = date(2026, 8, 3)
+    np.savez_compressed(
+        CircuitPriceTable.path_for(session, str(tmp_path)),
+        session=np.array(session.isoformat()), symbols=np.array(["A"]), prev_close_paise=np.array([23913]),
+        bands=np.array([5.0]), upper_paise=np.array([25108]), lower_paise=np.array([22718]),
+    )
+    assert CircuitPriceTable.load(session, str(tmp_path)) is None
+
+
+def test_empty_table_reports_every_symbol_unknown():
+    table = CircuitPriceTable.build(date(2026, 8, 3), {"A": 100.0}, {}, {})
+    assert len(table) == 0
+    hits, known = table.at_upper_circuit(["A", "B"], [105.0, 1.0])
+    assert hits.tolist() == [False, False]
+    assert known.tolist() == [False, False]
+    hits, known = table.at_lower_circuit(["A"], [95.0])
+    assert hits.tolist() == [False] and known.tolist() == [False]
+
+
+def test_revised_live_band_makes_symbol_unknown():
+    table = CircuitPriceTable.build(
+        date(2026, 8, 3), {"A": 100.0, "B": 100.0, "C": 100.0}, {"A": 20, "B": 20, "C": 20}, {"A": 1, "B": 1, "C": 1},
+    )
+    # B was revised to 5% after the table was built; C's live band could not be parsed
+    hits, known = table.at_upper_circuit(["A", "B", "C"], [120.0, 105.0, 120.0], [20, 5, float("nan")])
+    assert hits.tolist() == [True, False, False]
+    assert known.tolist() == [True, False, False]
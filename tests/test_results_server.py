@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results_server import normalize_path
+
+
+def test_symbols_are_percent_decoded_and_upper_cased():
+    assert normalize_path("/symbol/S%26SPOWER") == "/symbol/S&SPOWER"
+    assert normalize_path("/symbol/il%26fsengg/?pretty=1") == "/symbol/IL&FSENGG"
+    assert normalize_path("/symbol/IL&FSTRANS") == "/symbol/IL&FSTRANS"
+
+
+def test_dates_are_canonicalized():
+    assert normalize_path("/date/20260805") == "/date/2026-08-05"
+    assert normalize_path("/date/2026-08-05/") == "/date/2026-08-05"
+    assert normalize_path("/date/2026%2D08%2D05") == "/date/2026-08-05"
+
+
+def test_root_and_query_only_paths():
+    assert normalize_path("/?x=1") == "/"
+    assert normalize_path("/latest/") == "/latest"
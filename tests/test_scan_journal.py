@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_journal import ScanJournal
+
+SCAN_DATE = date(2026, 8, 5)
+CANDIDATES = [{"symbol": "ABC", "pct_change": 20.0}, {"symbol": "XYZ", "pct_change": 5.0}]
+ROW = {"Symbol": "ABC", "Company Name": "N/A", "Market Cap": "N/A"}
+
+
+def write_partial_scan(journal_dir):
+    journal = ScanJournal(SCAN_DATE, journal_dir)
+    journal.record_candidates(CANDIDATES, source="nse-live")
+    journal.record_verdict("ABC", False, dict(ROW))
+    journal.record_verdict("XYZ", True)
+    journal.close()
+    return journal.path
+
+
+def test_fresh_journal_is_not_resumed(tmp_path):
+    journal = ScanJournal(SCAN_DATE, str(tmp_path))
+    assert not journal.resumed
+    assert not journal.rotated
+    assert not os.path.exists(journal.path)  # Nothing is written until the first record
+
+
+def test_interrupted_scan_is_resumed(tmp_path):
+    write_partial_scan(str(tmp_path))
+
+    journal = ScanJournal(SCAN_DATE, str(tmp_path))
+    assert journal.resumed
+    assert journal.candidates == CANDIDATES
+    assert journal.verdicts["ABC"] == {"hit": False, "row": ROW, "details": False}
+    assert journal.verdicts["XYZ"] == {"hit": True, "row": None, "details": False}
+
+
+def test_details_are_replayed_into_the_row(tmp_path):
+    write_partial_scan(str(tmp_path))
+    journal = ScanJournal(SCAN_DATE, str(tmp_path))
+    journal.record_details("ABC", {"company_name": "Abc Ltd", "market_cap": "₹120.50 Cr"})
+    journal.close()
+
+    verdict = ScanJournal(SCAN_DATE, str(tmp_path)).verdicts["ABC"]
+    assert verdict["details"]
+    assert verdict["row"]["Company Name"] == "Abc Ltd"
+    assert verdict["row"]["Market Cap"] == "₹120.50 Cr"
+
+
+def test_torn_trailing_line_is_dropped_and_truncated(tmp_path):
+    path = write_partial_scan(str(tmp_path))
+    with open(path, "rb") as f:
+        intact = f.read()
+    with open(path, "ab") as f:
+        f.write(b'{"type":"verdict","symbol":"NEW","hi')  # Crash mid-write
+
+    journal = ScanJournal(SCAN_DATE, str(tmp_path))
+    assert set(journal.verdicts) == {"ABC", "XYZ"}
+    with open(path, "rb") as f:
+        assert f.read() == intact
+
+    # New records start on a clean line after the truncation
+    journal.record_verdict("NEW", True)
+    journal.close()
+    with open(path, encoding="utf-8") as f:
+        assert json.loads(f.readlines()[-1])["symbol"] == "NEW"
+
+
+def test_corrupt_line_stops_replay(tmp_path):
+    path = write_partial_scan(str(tmp_path))
+    with open(path, "ab") as f:
+        f.write(b"not json\n")
+        f.write(b'{"type":"complete"}\n')
+
+    journal = ScanJournal(SCAN_DATE, str(tmp_path))
+    assert journal.resumed
+    assert not journal.completed  # Records after the corrupt line are not trusted
+
+
+def test_completed_scan_is_rotated_not_resumed(tmp_path):
+    write_partial_scan(str(tmp_path))
+    journal = ScanJournal(SCAN_DATE, str(tmp_path))
+    journal.record_complete()
+    journal.close()
+
+    journal = ScanJournal(SCAN_DATE, str(tmp_path))
+    assert journal.rotated
+    assert not journal.resumed
+    assert not journal.completed
+    assert journal.verdicts == {}
+    assert not os.path.exists(journal.path)
+    assert os.path.exists(journal.previous_path)
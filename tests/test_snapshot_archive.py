@@ -0,0 +1,82 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("zstandard")
+
+from snapshot_archive import SnapshotArchive
+
+
+def make_archive(tmp_path, days=(5, 6, 7)):
+    archive = SnapshotArchive(str(tmp_path))
+    for day in days:
+        archive.append({"day": day}, timestamp=datetime(2026, 8, day, 20, 0))
+    return archive
+
+
+def reopen(tmp_path):
+    return SnapshotArchive(str(tmp_path))
+
+
+def test_get_returns_latest_snapshot_at_or_before(tmp_path):
+    make_archive(tmp_path)
+    archive = reopen(tmp_path)
+    assert archive.get("2026-08-04") is None
+    assert archive.get("2026-08-05")["data"] == {"day": 5}
+    assert archive.get("2026-08-06T19:59:59")["data"] == {"day": 5}
+    assert archive.get("2026-08-06T20:00:00")["data"] == {"day": 6}
+    assert archive.get("2026-08-31")["data"] == {"day": 7}
+
+
+def test_iter_snapshots_bounds_are_inclusive(tmp_path):
+    make_archive(tmp_path)
+    archive = reopen(tmp_path)
+    days = lambda start, end: [record["data"]["day"] for record in archive.iter_snapshots(start, end)]
+    assert days(None, None) == [5, 6, 7]
+    assert days("2026-08-06", "2026-08-06") == [6]
+    assert days("2026-08-06", None) == [6, 7]
+    assert days(None, "2026-08-05") == [5]
+    assert days("2026-08-08", None) == []
+
+
+def test_append_after_torn_index_line_starts_a_new_line(tmp_path):
+    archive = make_archive(tmp_path, days=(5, 6))
+    with open(archive.index_path, "rb") as f:
+        content = f.read()
+    with open(archive.index_path, "wb") as f:
+        f.write(content[:-4])  # Crash mid-write of the 08-06 entry
+
+    reopen(tmp_path).append({"day": 7}, timestamp=datetime(2026, 8, 7, 20, 0))
+
+    with open(archive.index_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert [line.split()[0] for line in lines] == ["2026-08-05T20:00:00", "2026-08-07T20:00:00"]
+
+    archive = reopen(tmp_path)
+    assert archive.timestamps() == ["2026-08-05T20:00:00", "2026-08-07T20:00:00"]
+    assert archive.get("2026-08-07")["data"] == {"day": 7}
+
+
+def test_index_line_without_newline_is_ignored(tmp_path):
+    archive = make_archive(tmp_path, days=(5, 6))
+    with open(archive.index_path, "rb") as f:
+        content = f.read()
+    with open(archive.index_path, "wb") as f:
+        f.write(content[:-2])  # Still three fields, but the length is cut short
+
+    assert reopen(tmp_path).timestamps() == ["2026-08-05T20:00:00"]
+
+
+def test_index_entries_past_end_of_data_are_dropped(tmp_path):
+    archive = make_archive(tmp_path, days=(5,))
+    data_size = os.path.getsize(archive.data_path)
+    with open(archive.index_path, "a", encoding="utf-8") as f:
+        f.write(f"2026-08-06T20:00:00 {data_size} 10\n")
+
+    archive = reopen(tmp_path)
+    assert archive.timestamps() == ["2026-08-05T20:00:00"]
+    assert archive.get("2026-08-06")["data"] == {"day": 5}
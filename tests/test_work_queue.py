@@ -0,0 +1,94 @@
+import os
+import sys
+import csv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import work_queue
+from work_queue import MAX_ATTEMPTS, PermanentTaskError, WorkQueue, run_worker
+
+
+def make_queue(tmp_path):
+    return WorkQueue(str(tmp_path / "queue.sqlite"))
+
+
+def test_claim_hands_out_each_task_once(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.enqueue(["2026-08-05"], 2) == 2
+    assert queue.enqueue(["2026-08-05"], 2) == 0  # Re-enqueueing is a no-op
+
+    first = queue.claim("w1")
+    second = queue.claim("w2")
+    assert (first["shard"], second["shard"]) == (0, 1)
+    assert first["attempts"] == 1
+    assert queue.claim("w3") is None
+    assert queue.status() == {"leased": 2}
+
+
+def test_expired_lease_is_taken_over_and_late_complete_is_rejected(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue(["2026-08-05"], 1)
+    task = queue.claim("dead", lease_seconds=-1)  # Lease already expired
+
+    takeover = queue.claim("alive")
+    assert takeover["id"] == task["id"]
+    assert takeover["attempts"] == 2
+
+    assert not queue.renew(task["id"], "dead")
+    assert not queue.complete(task["id"], "dead", [{"Symbol": "LATE"}])
+    assert queue.complete(task["id"], "alive", [{"Symbol": "ABC"}])
+    assert queue.status() == {"done": 1}
+
+
+def test_task_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue(["2026-08-05"], 1)
+    for attempt in range(MAX_ATTEMPTS):
+        task = queue.claim("w1")
+        assert task["attempts"] == attempt + 1
+        queue.fail(task["id"], "w1", "boom")
+    assert queue.claim("w1") is None
+    assert queue.status() == {"failed": 1}
+
+
+def test_permanent_failure_is_not_retried(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue(["2026-08-05"], 1)
+
+    def replay_task(scan_date, shard, shard_count):
+        raise PermanentTaskError(f"no snapshot archived for {scan_date}")
+
+    assert run_worker(queue, replay_task, "w1") == 0
+    assert queue.status() == {"failed": 1}
+
+
+def test_enqueue_skips_dates_with_a_different_shard_count(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue(["2026-08-05"], 2)
+    assert queue.enqueue(["2026-08-05", "2026-08-06"], 4) == 4  # Only the new date
+    assert queue.status() == {"pending": 6}
+
+
+def test_merge_writes_only_fully_done_dates(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue(["2026-08-05", "2026-08-06", "2026-08-07"], 2)
+
+    def replay_task(scan_date, shard, shard_count):
+        if scan_date == "2026-08-06":
+            raise PermanentTaskError("no snapshot archived")
+        return [{"Symbol": f"S{shard}", "Date": scan_date}]
+
+    # Leave one 08-07 shard unfinished
+    run_worker(queue, replay_task, "w1", max_tasks=3)
+    output = tmp_path / "out"
+    written = queue.merge(str(output))
+
+    assert written == {"2026-08-05": 2}
+    assert sorted(os.listdir(output)) == ["replay_20260805.csv"]
+    with open(output / "replay_20260805.csv", encoding="utf-8") as f:
+        assert [row["Symbol"] for row in csv.DictReader(f)] == ["S0", "S1"]
+
+
+def test_shard_of_is_stable():
+    assert work_queue.shard_of("RELIANCE", 8) == work_queue.shard_of("RELIANCE", 8)
+    assert all(0 <= work_queue.shard_of(symbol, 3) < 3 for symbol in ("A", "B", "IL&FSENGG"))
@@ -0,0 +1,116 @@
+"""
+NSE trading calendar.
+
+Sessions are precomputed from a local holiday file (weekends are implicit),
+with a per-calendar-day lookup table so that "the N sessions before day D"
+is an O(1) slice instead of a guess like `timedelta(days=25)`.
+"""
+
+import os
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+HOLIDAY_FILE = os.path.join("data", "nse_holidays.csv")
+
+
+class NSETradingCalendar:
+    """
+    Precomputed NSE trading sessions with O(1) lookback lookups
+    """
+
+    def __init__(self, holiday_file: str = HOLIDAY_FILE):
+        self.holiday_file = holiday_file
+        self.holidays: Dict[date, str] = self._load_holidays(holiday_file)
+
+        years = {day.year for day in self.holidays} or {datetime.now().year}
+        self._first_year = min(years)
+        self._last_year = max(years)
+        self._build()
+
+    @staticmethod
+    def _load_holidays(path: str) -> Dict[date, str]:
+        """Read 'Date,Description' rows (ISO dates); '#' lines are comments"""
+        holidays = {}
+        if not os.path.exists(path):
+            print(f"   ⚠️  Holiday file not found ({path}) - treating only weekends as non-trading days")
+            return holidays
+
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#") or line.lower().startswith("date,"):
+                    continue
+                stamp, _, description = line.partition(",")
+                try:
+                    holidays[datetime.strptime(stamp.strip(), "%Y-%m-%d").date()] = description.strip()
+                except ValueError:
+                    continue
+        return holidays
+
+    def _build(self):
+        """Precompute the session list and the day -> next-session-index table"""
+        self._start = date(self._first_year, 1, 1)
+        end = date(self._last_year, 12, 31)
+
+        self.sessions: List[date] = []
+        # _next_session[d - start] = index of the first session on or after day d
+        self._next_session = array("i")
+        day = self._start
+        while day <= end:
+            self._next_session.append(len(self.sessions))
+            if day.weekday() < 5 and day not in self.holidays:
+                self.sessions.append(day)
+            day += timedelta(days=1)
+        self._session_index = {day: i for i, day in enumerate(self.sessions)}
+
+    def _ensure_covers(self, day: date):
+        """Extend the precomputed range (weekends only) for years without a holiday list"""
+        if self._first_year <= day.year <= self._last_year:
+            return
+        print(f"   ⚠️  No NSE holiday list for {day.year} - only weekends are excluded for that year")
+        self._first_year = min(self._first_year, day.year)
+        self._last_year = max(self._last_year, day.year)
+        self._build()
+
+    def _index_on_or_after(self, day: date) -> int:
+        self._ensure_covers(day)
+        return self._next_session[(day - self._start).days]
+
+    def is_session(self, day: date) -> bool:
+        """True if NSE is open on this day"""
+        self._ensure_covers(day)
+        return day in self._session_index
+
+    def sessions_before(self, day: date, count: int) -> List[date]:
+        """
+        The `count` trading sessions strictly before `day`, oldest first
+
+        Args:
+            day: Reference date (need not be a session)
+            count: Number of sessions to return
+        """
+        self._ensure_covers(day - timedelta(days=count * 2 + 30))
+        end = self._index_on_or_after(day)
+        return self.sessions[max(0, end - count):end]
+
+    def previous_session(self, day: date) -> Optional[date]:
+        """The last session strictly before `day`"""
+        window = self.sessions_before(day, 1)
+        return window[0] if window else None
+
+    def next_session(self, day: date) -> date:
+        """The first session strictly after `day`"""
+        self._ensure_covers(day + timedelta(days=14))
+        return self.sessions[self._index_on_or_after(day + timedelta(days=1))]
+
+    def missing_sessions(self, days: Iterable, expected: List[date]) -> List[date]:
+        """
+        Sessions from `expected` that have no bar in `days`
+
+        Args:
+            days: Dates (or Timestamps) present in a price history
+            expected: Sessions that should be present (e.g. from sessions_before)
+        """
+        present = {day.date() if isinstance(day, datetime) else day for day in days}
+        return [day for day in expected if day not in present]
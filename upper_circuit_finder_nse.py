@@ -7,15 +7,29 @@ RESULT: ~50-100x faster! (30 seconds vs 26 minutes)
 
 import os
 import sys
+import math
+import argparse
+from contextlib import nullcontext
 import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 import time
 import requests
-from typing import List, Dict
+from typing import List, Dict, Optional
 from github import Github, Auth
 from dotenv import load_dotenv
 import subprocess
+from snapshot_archive import SnapshotArchive
+from band_history import BandHistory, parse_band
+from trading_calendar import NSETradingCalendar
+from scan_journal import ScanJournal
+import results_server
+from run_profiler import RunProfiler, PROFILE_DIR
+import work_queue
+from nse_http import NSE_USER_AGENT
+from circuit_table import CircuitPriceTable, download_bhavcopy, load_bhavcopy, ticks_from_month_end
+import candidate_sources
+from candidate_sources import FetchCancelled
 
 # Fix Unicode encoding for Windows console
 if sys.platform == 'win32':
@@ -35,6 +49,9 @@ CIRCUIT_LIMIT_MID_CAP = 10
 CIRCUIT_LIMIT_SMALL_CAP = 20
 CIRCUIT_LIMIT_DEFAULT = 10
 
+# Number of prior trading sessions that must be circuit-free
+LOOKBACK_SESSIONS = 14
+
 # GitHub Configuration
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN') or os.environ.get('GITHUB_PAT') or ""
 GITHUB_USERNAME = os.environ.get('GITHUB_USERNAME') or "pkalyankumar1010"
@@ -44,15 +61,36 @@ GITHUB_REPO = os.environ.get('GITHUB_REPO') or "upper_circuit_finder"
 # NSE API
 NSE_PRICE_BAND_API = "https://www.nseindia.com/api/live-analysis-price-band-hitter"
 
+# Yahoo multi-symbol quote endpoint - only the fields we need, many symbols per request
+YAHOO_QUOTE_API = "https://query1.finance.yahoo.com/v7/finance/quote"
+YAHOO_QUOTE_FIELDS = "symbol,longName,shortName,marketCap,currency,regularMarketPrice"
+YAHOO_QUOTE_BATCH_SIZE = 50
+# FX quote fetched in the same batch, for the rare symbol Yahoo reports in USD
+YAHOO_USD_INR_SYMBOL = "USDINR=X"
+
+
+class HistoryUnavailable(Exception):
+    """Raised by a strict 14-day check when Yahoo returns no usable history"""
+
 
 class NSEUpperCircuitFinder:
     """
     NSE-optimized version - gets stocks that hit circuit from NSE directly!
     """
     
-    def __init__(self):
+    def __init__(self, hedge_delay: float = candidate_sources.HEDGE_DELAY_SECONDS,
+                 candidate_timeout: float = candidate_sources.CANDIDATE_TIMEOUT_SECONDS):
         self.results = []
         self.nse_session = self._create_nse_session()
+        self.snapshot_archive = SnapshotArchive()
+        self.band_history = BandHistory()
+        self.calendar = NSETradingCalendar()
+        self.journal = None
+        self._circuit_tables = {}
+        self.hedge_delay = hedge_delay
+        self.candidate_timeout = candidate_timeout
+        self.candidate_source = None
+        self.candidate_source_report = []
         
     def _create_nse_session(self, use_curl_cffi=True):
         """Create a session that mimics a real browser"""
@@ -75,7 +113,7 @@ class NSEUpperCircuitFinder:
         session = requests.Session()
         # Enhanced browser headers - mimicking latest Chrome on Windows
         session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+            'User-Agent': NSE_USER_AGENT,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
             'Accept-Language': 'en-US,en;q=0.9',
             'Accept-Encoding': 'gzip, deflate, br',
@@ -101,10 +139,22 @@ class NSEUpperCircuitFinder:
             # Use standard requests
             return self.nse_session.get(url, **kwargs)
     
-    def get_upper_circuit_stocks_from_nse(self) -> List[Dict]:
+    def _pause(self, seconds: float, cancel=None):
+        """time.sleep that stops early (raising FetchCancelled) once a hedged fetch is cancelled"""
+        if cancel is None:
+            time.sleep(seconds)
+        else:
+            candidate_sources.CandidateSource.pause(cancel, seconds)
+    
+    def get_upper_circuit_stocks_from_nse(self, cancel=None, on_payload=None) -> List[Dict]:
         """
         Fetch stocks that hit upper circuit from NSE API
         
+        Args:
+            cancel: Optional threading.Event; when set, retries and waits stop early
+            on_payload: Optional callable receiving the raw payload instead of it being
+                        archived and band-recorded here (used when fetching off the main thread)
+        
         Returns:
             List of stocks with their circuit data from NSE
         """
@@ -131,7 +181,7 @@ class NSEUpperCircuitFinder:
                         print(f"   ⚠ Attempt {attempt + 1}/{max_retries}: Homepage returned 403 (Forbidden)")
                         if attempt < max_retries - 1:
                             print(f"   → Waiting {retry_delay} seconds before retry...")
-                            time.sleep(retry_delay)
+                            self._pause(retry_delay, cancel)
                             retry_delay *= 2  # Exponential backoff
                             # Try recreating session with different headers
                             self.nse_session = self._create_nse_session()
@@ -146,13 +196,15 @@ class NSEUpperCircuitFinder:
                     else:
                         print(f"   ⚠ Homepage returned {homepage_response.status_code}")
                         if attempt < max_retries - 1:
-                            time.sleep(retry_delay)
+                            self._pause(retry_delay, cancel)
                         else:
                             return []
+                except FetchCancelled:
+                    raise
                 except Exception as e:
                     print(f"   ⚠ Attempt {attempt + 1}/{max_retries} failed: {e}")
                     if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
+                        self._pause(retry_delay, cancel)
                     else:
                         return []
             
@@ -161,7 +213,7 @@ class NSEUpperCircuitFinder:
                 return []
             
             print(f"   ✓ Homepage loaded (Cookies received: {len(self.nse_session.cookies)})")
-            time.sleep(1)
+            self._pause(1, cancel)
             
             # Step 2: Visit market data page (simulating user navigation)
             print("   Step 2: Navigating to market data...")
@@ -187,7 +239,7 @@ class NSEUpperCircuitFinder:
                 market_page_url = homepage_url
                 print(f"   → Using homepage as referer")
             
-            time.sleep(1)
+            self._pause(1, cancel)
             
             # Step 3: Now fetch price band hitters with proper referer
             print("   Step 3: Fetching price band hitters...")
@@ -281,96 +333,15 @@ class NSEUpperCircuitFinder:
                 
                 # Debug: Print response structure
                 print(f"   ✓ NSE API responded successfully!")
-                print(f"   Response keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
                 
-                # Extract upper circuit stocks
-                # NSE API structure: {'upper': [...], 'lower': [...], 'both': [...], 'count': {...}}
-                upper_circuit_stocks = []
-                
-                # Get upper circuit stocks from 'upper' key
-                if 'upper' in data:
-                    print(f"   'upper' key exists, type: {type(data['upper'])}")
-                    
-                    # NSE API structure: data['upper'] is a dict with 'AllSec', 'SecGtr20', 'SecLwr20'
-                    # Each has a 'data' array with stock details
-                    if isinstance(data['upper'], dict):
-                        # Combine data from all categories
-                        all_upper_stocks = []
-                        
-                        for category in ['AllSec', 'SecGtr20', 'SecLwr20']:
-                            if category in data['upper'] and 'data' in data['upper'][category]:
-                                stocks_in_category = data['upper'][category]['data']
-                                all_upper_stocks.extend(stocks_in_category)
-                                print(f"   Found {len(stocks_in_category)} stocks in '{category}'")
-                        
-                        print(f"   Total upper circuit stocks (with duplicates): {len(all_upper_stocks)}")
-                        
-                        # Remove duplicates by symbol
-                        seen_symbols = set()
-                        unique_stocks = []
-                        for stock in all_upper_stocks:
-                            symbol = stock.get('symbol', '')
-                            if symbol and symbol not in seen_symbols:
-                                seen_symbols.add(symbol)
-                                unique_stocks.append(stock)
-                        
-                        print(f"   Unique stocks: {len(unique_stocks)}")
-                        
-                        # Parse each stock
-                        for stock in unique_stocks:
-                            try:
-                                # Debug: Print first stock structure
-                                if len(upper_circuit_stocks) == 0:
-                                    print(f"   Sample stock keys: {list(stock.keys())}")
-                                
-                                symbol = stock.get('symbol', '')
-                                
-                                # Get percentage change (NSE provides this)
-                                pct_change_str = stock.get('pChange', '0')
-                                pct_change = float(pct_change_str.strip())
-                                
-                                # Get price band (circuit limit) from NSE
-                                price_band_str = stock.get('priceBand', '0')
-                                price_band = float(price_band_str) if price_band_str else 10
-                                
-                                # Only include stocks that are VERY CLOSE to circuit limit
-                                # Filter: (circuit_limit - pct_change) / circuit_limit < 1%
-                                # This means: pct_change >= circuit_limit * 0.99
-                                if pct_change > 0 and price_band > 0:
-                                    # Calculate how close to circuit limit
-                                    difference = price_band - pct_change
-                                    relative_difference = (difference / price_band) if price_band > 0 else 100
-                                    
-                                    # Only include if within 1% of circuit limit
-                                    if relative_difference < 0.01:  # Less than 1%
-                                        ltp_str = stock.get('ltp', '0')
-                                        ltp = float(ltp_str) if ltp_str else 0
-                                        
-                                        upper_circuit_stocks.append({
-                                            'symbol': symbol,
-                                            'pct_change': pct_change,
-                                            'price_band': price_band,  # Circuit limit from NSE!
-                                            'ltp': ltp,
-                                            'high': float(stock.get('highPrice', 0) or 0),
-                                            'low': float(stock.get('lowPrice', 0) or 0),
-                                            'open': 0,  # NSE doesn't provide open in this API
-                                            'close': 0,
-                                            'volume': float(stock.get('totalTradedVol', 0) or 0),
-                                            'closeness': relative_difference * 100  # Store for debugging
-                                        })
-                            except Exception as e:
-                                print(f"   ⚠ Error parsing stock: {e}")
-                                continue
-                        
-                        print(f"✓ After strict filtering: {len(upper_circuit_stocks)} stocks within 1% of circuit limit")
-                        print(f"   (Original: {len(unique_stocks)} → Filtered: {len(upper_circuit_stocks)})")
-                        return upper_circuit_stocks
-                    else:
-                        print(f"   'upper' is not a dict")
-                        return []
+                # Keep the raw payload (near-misses, 'lower' and 'both' sections included)
+                if on_payload is not None:
+                    on_payload(data)
                 else:
-                    print(f"   'upper' key not in response")
-                    return []
+                    self._keep_payload(data)
+                print(f"   Response keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
+                
+                return self._parse_upper_circuit_stocks(data)
             elif response.status_code == 401:
                 print(f"⚠ NSE API returned 401 (Unauthorized)")
                 print(f"   NSE has strict bot protection. Using fallback method...")
@@ -389,98 +360,355 @@ class NSEUpperCircuitFinder:
                 print(f"   Response: {response.text[:200]}")
                 return []
                 
+        except FetchCancelled:
+            print("   ↷ NSE fetch cancelled - another candidate source answered first")
+            return []
         except Exception as e:
             print(f"❌ Error fetching from NSE API: {e}")
             print("   This might be due to NSE API being down or network issues")
             return []
     
-    def check_historical_circuit(self, symbol: str, circuit_limit: float) -> bool:
+    def _circuit_table_for(self, session: date) -> Optional[CircuitPriceTable]:
+        """Load (and cache) the precomputed circuit price table for a session"""
+        if session not in self._circuit_tables:
+            try:
+                self._circuit_tables[session] = CircuitPriceTable.load(session)
+            except Exception as e:
+                print(f"   ⚠️  Could not load circuit table for {session}: {e}")
+                self._circuit_tables[session] = None
+        return self._circuit_tables[session]
+    
+    def _parse_upper_circuit_stocks(self, data, session_date: Optional[date] = None) -> List[Dict]:
+        """
+        Extract stocks at their upper circuit from a price band hitter payload
+        
+        Uses the precomputed tick-exact circuit prices when a table exists for the
+        session, and falls back to "within 1% of the band" for symbols without one.
+        
+        Args:
+            data: Decoded NSE price band hitter response (live or from the snapshot archive)
+            session_date: Session the payload belongs to (defaults to today)
+            
+        Returns:
+            List of stocks with their circuit data from NSE
+        """
+        # Extract upper circuit stocks
+        # NSE API structure: {'upper': [...], 'lower': [...], 'both': [...], 'count': {...}}
+        upper_circuit_stocks = []
+        
+        # Get upper circuit stocks from 'upper' key
+        if 'upper' in data:
+            print(f"   'upper' key exists, type: {type(data['upper'])}")
+            
+            # NSE API structure: data['upper'] is a dict with 'AllSec', 'SecGtr20', 'SecLwr20'
+            # Each has a 'data' array with stock details
+            if isinstance(data['upper'], dict):
+                # Combine data from all categories
+                all_upper_stocks = []
+                
+                for category in ['AllSec', 'SecGtr20', 'SecLwr20']:
+                    if category in data['upper'] and 'data' in data['upper'][category]:
+                        stocks_in_category = data['upper'][category]['data']
+                        all_upper_stocks.extend(stocks_in_category)
+                        print(f"   Found {len(stocks_in_category)} stocks in '{category}'")
+                
+                print(f"   Total upper circuit stocks (with duplicates): {len(all_upper_stocks)}")
+                
+                # Remove duplicates by symbol
+                seen_symbols = set()
+                unique_stocks = []
+                for stock in all_upper_stocks:
+                    symbol = stock.get('symbol', '')
+                    if symbol and symbol not in seen_symbols:
+                        seen_symbols.add(symbol)
+                        unique_stocks.append(stock)
+                
+                print(f"   Unique stocks: {len(unique_stocks)}")
+                
+                # Exact check: LTP == tick-rounded upper circuit price, all stocks at once
+                exact_hits = {}
+                circuit_table = self._circuit_table_for(session_date or datetime.now().date())
+                if circuit_table is not None:
+                    symbols = [stock.get('symbol', '') for stock in unique_stocks]
+                    ltps = []
+                    live_bands = []
+                    for stock in unique_stocks:
+                        try:
+                            ltps.append(float(str(stock.get('ltp') or 0).replace(',', '')))
+                        except ValueError:
+                            ltps.append(0.0)
+                        band = parse_band(stock.get('priceBand'))
+                        live_bands.append(math.nan if band is None else band)
+                    # Symbols whose live band no longer matches the table fall back to the 1% rule
+                    hits, known = circuit_table.at_upper_circuit(symbols, ltps, live_bands)
+                    exact_hits = {symbol: bool(hit) for symbol, hit, is_known in zip(symbols, hits, known) if is_known}
+                    print(f"   🎯 Exact circuit prices available for {len(exact_hits)} of {len(symbols)} stocks")
+                
+                # Parse each stock
+                for stock in unique_stocks:
+                    try:
+                        # Debug: Print first stock structure
+                        if len(upper_circuit_stocks) == 0:
+                            print(f"   Sample stock keys: {list(stock.keys())}")
+                        
+                        symbol = stock.get('symbol', '')
+                        
+                        # Get percentage change (NSE provides this)
+                        pct_change_str = stock.get('pChange', '0')
+                        pct_change = float(pct_change_str.strip())
+                        
+                        # Get price band (circuit limit) from NSE
+                        price_band_str = stock.get('priceBand', '0')
+                        price_band = float(price_band_str) if price_band_str else 10
+                        
+                        # Calculate how close to circuit limit
+                        difference = price_band - pct_change
+                        relative_difference = (difference / price_band) if price_band > 0 else 100
+                        
+                        if symbol in exact_hits:
+                            # LTP is exactly at the precomputed upper circuit price
+                            at_circuit = exact_hits[symbol]
+                        else:
+                            # Only include stocks that are VERY CLOSE to circuit limit
+                            # Filter: (circuit_limit - pct_change) / circuit_limit < 1%
+                            # This means: pct_change >= circuit_limit * 0.99
+                            at_circuit = pct_change > 0 and price_band > 0 and relative_difference < 0.01
+                        
+                        if at_circuit:
+                            ltp_str = stock.get('ltp', '0')
+                            ltp = float(ltp_str) if ltp_str else 0
+                            
+                            upper_circuit_stocks.append({
+                                'symbol': symbol,
+                                'pct_change': pct_change,
+                                'price_band': price_band,  # Circuit limit from NSE!
+                                'ltp': ltp,
+                                'high': float(stock.get('highPrice', 0) or 0),
+                                'low': float(stock.get('lowPrice', 0) or 0),
+                                'open': 0,  # NSE doesn't provide open in this API
+                                'close': 0,
+                                'volume': float(stock.get('totalTradedVol', 0) or 0),
+                                'closeness': relative_difference * 100  # Store for debugging
+                            })
+                    except Exception as e:
+                        print(f"   ⚠ Error parsing stock: {e}")
+                        continue
+                
+                print(f"✓ After strict filtering: {len(upper_circuit_stocks)} stocks at circuit limit")
+                print(f"   (Original: {len(unique_stocks)} → Filtered: {len(upper_circuit_stocks)})")
+                return upper_circuit_stocks
+            else:
+                print(f"   'upper' is not a dict")
+                return []
+        else:
+            print(f"   'upper' key not in response")
+            return []
+    
+    def _keep_payload(self, data):
+        """Archive a raw NSE payload and record the bands it carries"""
+        self._archive_snapshot(data)
+        self._record_bands(data)
+    
+    def _archive_snapshot(self, data):
+        """Append the raw NSE payload to the compressed snapshot archive"""
+        if not self.snapshot_archive.available:
+            print("   ℹ️  zstandard not installed, skipping raw snapshot archive")
+            return
+        try:
+            key = self.snapshot_archive.append(data)
+            print(f"   📦 Raw snapshot archived ({key})")
+        except Exception as e:
+            print(f"   ⚠️  Could not archive raw snapshot: {e}")
+    
+    def _record_bands(self, data):
+        """Store today's price band for every symbol in the payload (all sections)"""
+        if not isinstance(data, dict):
+            return
+        bands = {}
+        for section in ['upper', 'lower', 'both']:
+            if not isinstance(data.get(section), dict):
+                continue
+            for category in data[section].values():
+                if not isinstance(category, dict) or not isinstance(category.get('data'), list):
+                    continue
+                for stock in category['data']:
+                    symbol = stock.get('symbol', '') if isinstance(stock, dict) else ''
+                    band = parse_band(stock.get('priceBand')) if symbol else None
+                    if band is not None:
+                        bands[symbol] = band
+        try:
+            self.band_history.record(datetime.now().date(), bands)
+            print(f"   📐 Recorded price bands for {len(bands)} symbols")
+        except Exception as e:
+            print(f"   ⚠️  Could not record price bands: {e}")
+    
+    @staticmethod
+    def _price_column(frame: pd.DataFrame, name: str) -> pd.Series:
+        """Get a price column as floats (yf.download may return MultiIndex columns)"""
+        column = frame[name]
+        if isinstance(column, pd.DataFrame):
+            column = column.iloc[:, 0]
+        return column.astype(float)
+    
+    def check_historical_circuit(self, symbol: str, circuit_limit: float, as_of: Optional[date] = None,
+                                 strict: bool = False) -> bool:
         """
         Check if stock hit upper OR lower circuit in last 14 days
         
         Args:
             symbol: Stock symbol (without .NS)
             circuit_limit: The circuit limit percentage for this stock
+            as_of: Scan date (defaults to today); the 14 sessions before it are checked
+            strict: Raise instead of guessing a verdict when the history can't be fetched
+                    (the live scan guesses; replays raise so the task is retried)
             
         Returns:
             True if hit any circuit in last 14 days, False otherwise
+            
+        Raises:
+            HistoryUnavailable: In strict mode, if Yahoo returned no history for the window
         """
         try:
             yahoo_symbol = f"{symbol}.NS"
             
-            # Fetch last 20 days of data (to ensure we have 14 trading days)
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=25)
+            # Exactly the 14 NSE sessions before the scan date (from the trading calendar)
+            as_of = as_of or datetime.now().date()
+            window = self.calendar.sessions_before(as_of, LOOKBACK_SESSIONS)
+            start_date = window[0]
+            end_date = window[-1] + timedelta(days=1)  # yfinance's end date is exclusive
             
             # Get historical data
-            stock = yf.Ticker(yahoo_symbol)
             hist = yf.download(yahoo_symbol, start=start_date, end=end_date, progress=False, auto_adjust=True)
             
-            if hist is None or hist.empty or len(hist) < 2:
+            if hist is None or hist.empty:
+                if strict:
+                    raise HistoryUnavailable(f"no Yahoo history for {symbol} before {as_of}")
                 # Not enough data - be conservative and exclude (return True)
                 return True  # Can't verify, so exclude for safety
             
-            # Get previous trading days (excluding today) - use whatever we have
-            if len(hist) >= 15:
-                previous_days = hist.iloc[-15:-1]  # Full 14 days
-            else:
-                previous_days = hist.iloc[:-1]  # Whatever days we have (at least 1)
+            # Keep only bars on the expected sessions (drops stray/special-session bars)
+            window_days = set(window)
+            previous_days = hist[[day.date() in window_days for day in hist.index]]
+            if previous_days.empty:
+                if strict:
+                    raise HistoryUnavailable(f"no Yahoo bars for {symbol} on the {len(window)} sessions before {as_of}")
+                return True  # Can't verify, so exclude for safety
+            
+            # Report exact gaps instead of silently checking a short history
+            missing = self.calendar.missing_sessions(previous_days.index, window)
+            if missing:
+                print(f"   ⚠ {symbol}: Yahoo history is missing {len(missing)} of {len(window)} sessions "
+                      f"({', '.join(day.strftime('%d %b') for day in missing)})")
             
             # If we have less than 14 days of data, we can still check what we have
             days_checked = len(previous_days)
             
-            # Check each day for BOTH upper and lower circuits
-            for i in range(len(previous_days)):
-                day_data = previous_days.iloc[i]
-                
-                day_open_val = day_data['Open']
-                day_close_val = day_data['Close']
-                day_high_val = day_data['High']
-                day_low_val = day_data['Low']
-                
-                day_open = float(day_open_val.iloc[0]) if hasattr(day_open_val, 'iloc') else float(day_open_val)
-                day_close = float(day_close_val.iloc[0]) if hasattr(day_close_val, 'iloc') else float(day_close_val)
-                day_high = float(day_high_val.iloc[0]) if hasattr(day_high_val, 'iloc') else float(day_high_val)
-                day_low = float(day_low_val.iloc[0]) if hasattr(day_low_val, 'iloc') else float(day_low_val)
-                
-                if day_open == 0 or pd.isna(day_open) or pd.isna(day_close):
-                    continue
-                
-                # Calculate percentage change
-                day_pct_change = ((day_close - day_open) / day_open) * 100
-                
-                # Also check from previous day's close (more accurate)
-                if i > 0:
-                    prev_day_close_val = previous_days.iloc[i-1]['Close']
-                    prev_day_close = float(prev_day_close_val.iloc[0]) if hasattr(prev_day_close_val, 'iloc') else float(prev_day_close_val)
-                    if prev_day_close > 0 and not pd.isna(prev_day_close):
-                        day_pct_from_prev = ((day_close - prev_day_close) / prev_day_close) * 100
-                    else:
-                        day_pct_from_prev = day_pct_change
-                else:
-                    day_pct_from_prev = day_pct_change
-                
-                day_max_pct = max(day_pct_change, day_pct_from_prev)
-                day_min_pct = min(day_pct_change, day_pct_from_prev)
-                
-                # Check for UPPER circuit hit
-                day_high_close_ratio = (day_close / day_high) if day_high > 0 else 0
-                hit_upper_circuit = (day_max_pct >= (circuit_limit - 0.3) and day_high_close_ratio >= 0.997)
-                
-                # Check for LOWER circuit hit
-                # Lower circuit: stock dropped close to negative circuit limit and close is near day's low
-                day_low_close_ratio = (day_close / day_low) if day_low > 0 else 2
-                hit_lower_circuit = (day_min_pct <= -(circuit_limit - 0.3) and day_low_close_ratio <= 1.003)
-                
-                # If hit either circuit, exclude this stock
-                if hit_upper_circuit or hit_lower_circuit:
-                    return True  # Hit circuit in last 14 days (or whatever days we checked)
+            opens = self._price_column(previous_days, 'Open')
+            closes = self._price_column(previous_days, 'Close')
+            highs = self._price_column(previous_days, 'High')
+            lows = self._price_column(previous_days, 'Low')
+            
+            # Band actually in force on each day (NSE revises bands often);
+            # days before our first band observation fall back to today's band
+            bands = pd.Series(
+                self.band_history.bands_for(symbol, previous_days.index, default=circuit_limit),
+                index=previous_days.index,
+                dtype=float,
+            )
+            revised_days = int((bands != circuit_limit).sum())
+            if revised_days:
+                print(f"   📐 {symbol}: band differed from today's {circuit_limit}% on {revised_days} of {days_checked} days")
+            
+            valid = (opens != 0) & opens.notna() & closes.notna()
+            
+            # Calculate percentage change
+            day_pct_change = ((closes - opens) / opens) * 100
+            
+            # Also check from previous day's close (more accurate)
+            prev_closes = closes.shift(1)
+            day_pct_from_prev = (((closes - prev_closes) / prev_closes) * 100).where(prev_closes > 0, day_pct_change)
+            
+            day_max_pct = pd.concat([day_pct_change, day_pct_from_prev], axis=1).max(axis=1)
+            day_min_pct = pd.concat([day_pct_change, day_pct_from_prev], axis=1).min(axis=1)
+            
+            # Check for UPPER circuit hit
+            day_high_close_ratio = (closes / highs).where(highs > 0, 0)
+            hit_upper_circuit = (day_max_pct >= (bands - 0.3)) & (day_high_close_ratio >= 0.997)
+            
+            # Check for LOWER circuit hit
+            # Lower circuit: stock dropped close to negative circuit limit and close is near day's low
+            day_low_close_ratio = (closes / lows).where(lows > 0, 2)
+            hit_lower_circuit = (day_min_pct <= -(bands - 0.3)) & (day_low_close_ratio <= 1.003)
+            
+            # If hit either circuit on any day, exclude this stock
+            # ('No Band' days are NaN and never compare as a hit)
+            if (valid & (hit_upper_circuit | hit_lower_circuit)).any():
+                return True  # Hit circuit in last 14 days (or whatever days we checked)
             
             return False  # Did not hit any circuit in the days checked
             
         except Exception as e:
+            if strict:
+                raise
             return False  # On error, assume no circuit hit
     
+    @staticmethod
+    def _format_market_cap(market_cap, currency, inr_per_usd=None) -> str:
+        """Format a Yahoo market cap as '₹X Cr', converting only if it isn't already INR"""
+        if not market_cap or market_cap <= 0:
+            return "N/A"
+        currency = (currency or 'INR').upper()
+        if currency == 'INR':
+            market_cap_inr = market_cap
+        elif currency == 'USD' and inr_per_usd:
+            market_cap_inr = market_cap * inr_per_usd
+        else:
+            return "N/A"  # Unknown currency or no FX rate - don't guess
+        return f"₹{market_cap_inr / 1e7:,.0f} Cr"
+    
+    def get_stock_details_bulk(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Get company name and market cap for many symbols with one quote request per batch
+        
+        Args:
+            symbols: Stock symbols (without .NS)
+            
+        Returns:
+            Mapping of symbol -> {'company_name', 'market_cap'}; symbols missing from
+            the bulk response fall back to get_stock_details
+        """
+        details = {}
+        for start in range(0, len(symbols), YAHOO_QUOTE_BATCH_SIZE):
+            batch = symbols[start:start + YAHOO_QUOTE_BATCH_SIZE]
+            yahoo_symbols = [f"{symbol}.NS" for symbol in batch] + [YAHOO_USD_INR_SYMBOL]
+            try:
+                # Private yfinance module - any import/API change falls back to per-symbol lookups
+                from yfinance.data import YfData
+                response = YfData().get_raw_json(YAHOO_QUOTE_API, params={
+                    'symbols': ','.join(yahoo_symbols),
+                    'fields': YAHOO_QUOTE_FIELDS,
+                    'formatted': 'false',
+                })
+                quotes = {quote.get('symbol'): quote for quote in response['quoteResponse']['result']}
+            except Exception as e:
+                print(f"   ⚠ Bulk quote request failed ({e}), falling back to per-symbol lookups")
+                quotes = {}
+            
+            inr_per_usd = quotes.get(YAHOO_USD_INR_SYMBOL, {}).get('regularMarketPrice')
+            fetched = sum(1 for symbol in batch if f"{symbol}.NS" in quotes)
+            print(f"   📇 Fetched details for {fetched} of {len(batch)} symbols in one quote request")
+            
+            for symbol in batch:
+                quote = quotes.get(f"{symbol}.NS")
+                if quote is None:
+                    details[symbol] = self.get_stock_details(symbol)
+                    continue
+                details[symbol] = {
+                    'company_name': quote.get('longName') or quote.get('shortName') or 'N/A',
+                    'market_cap': self._format_market_cap(quote.get('marketCap'), quote.get('currency'), inr_per_usd),
+                }
+        return details
+    
     def get_stock_details(self, symbol: str) -> Dict:
         """Get additional stock details from Yahoo Finance"""
         try:
@@ -488,13 +716,8 @@ class NSEUpperCircuitFinder:
             stock = yf.Ticker(yahoo_symbol)
             info = stock.info
             
-            # Get market cap
-            market_cap_usd = info.get('marketCap', 0)
-            if market_cap_usd and market_cap_usd > 0:
-                market_cap_inr_cr = (market_cap_usd * 83) / 1e7
-                market_cap_display = f"₹{market_cap_inr_cr:,.0f} Cr"
-            else:
-                market_cap_display = "N/A"
+            # Get market cap (Yahoo reports it in the quote currency - INR for .NS symbols)
+            market_cap_display = self._format_market_cap(info.get('marketCap', 0), info.get('currency'))
             
             company_name = info.get('longName', info.get('shortName', 'N/A'))
             
@@ -519,8 +742,20 @@ class NSEUpperCircuitFinder:
         
         start_time = datetime.now()
         
-        # Step 1: Get stocks that hit upper circuit from NSE
-        nse_upper_circuit_stocks = self.get_upper_circuit_stocks_from_nse()
+        # Resume from the journal if an earlier run for today was interrupted
+        self.journal = ScanJournal(start_time.date())
+        if self.journal.rotated:
+            print(f"ℹ️  An earlier scan for today already completed; starting fresh "
+                  f"(previous journal kept at {self.journal.previous_path})")
+        if self.journal.resumed:
+            print(f"♻️  Resuming interrupted scan from {self.journal.path}")
+            print(f"   {len(self.journal.candidates)} candidates, {len(self.journal.verdicts)} already checked")
+            nse_upper_circuit_stocks = self.journal.candidates
+        else:
+            # Step 1: Get stocks that hit upper circuit (NSE, hedged with the local sources)
+            nse_upper_circuit_stocks = self.fetch_candidates(start_time.date())
+            if nse_upper_circuit_stocks:
+                self.journal.record_candidates(nse_upper_circuit_stocks, source=self.candidate_source)
         
         if not nse_upper_circuit_stocks:
             print("\n⚠️  No stocks found from NSE API or API error.")
@@ -535,28 +770,88 @@ class NSEUpperCircuitFinder:
         print("   (Checking both upper AND lower circuits)")
         print()
         
+        try:
+            self._check_candidates(nse_upper_circuit_stocks)
+            self.journal.record_complete()
+        finally:
+            self.journal.close()
+        
+        elapsed = (datetime.now() - start_time).total_seconds()
+        print()
+        print(f"✅ NSE-optimized scan complete in {elapsed:.1f} seconds!")
+        print(f"   Checked only {len(nse_upper_circuit_stocks)} stocks (vs 2,184 in full scan)")
+        print(f"   Speed improvement: ~{(26*60)/elapsed:.0f}x faster than full scan!")
+        
+        return self.results
+    
+    def fetch_candidates(self, session: date) -> List[Dict]:
+        """
+        Fetch the day's candidate list from the live NSE API, hedged with the local sources
+        
+        If NSE hasn't answered after `hedge_delay` seconds, the bhavcopy and
+        snapshot archive sources are started as well; the first non-empty
+        answer wins and the rest are cancelled.
+        
+        Returns:
+            Candidate stocks (empty if no source produced any within `candidate_timeout`)
+        """
+        nse_source = candidate_sources.NSELiveSource(self)
+        sources = [
+            nse_source,
+            candidate_sources.BhavcopySource(session),
+            candidate_sources.ArchiveSource(self, session),
+        ]
+        stocks, report = candidate_sources.fetch_hedged(sources, self.hedge_delay, self.candidate_timeout)
+        self.candidate_source_report = report
+        self.candidate_source = next((entry['source'] for entry in report if entry['status'] == 'won'), None)
+        
+        # Persist NSE's payload here on the main thread, and only if the NSE fetch finished
+        # within the hedged fetch - a cancelled straggler must not touch the archive or bands
+        nse_status = next(entry['status'] for entry in report if entry['source'] == nse_source.name)
+        if nse_status in ('won', 'discarded', 'empty') and nse_source.payload is not None:
+            self._keep_payload(nse_source.payload)
+        
+        print(f"   📡 Candidate sources ({self.candidate_source or 'no result'} won):")
+        for entry in report:
+            latency = f"{entry['latency']:.2f}s" if entry['latency'] is not None else "-"
+            print(f"      {entry['source']:<10} {entry['status']:<12} {latency}")
+        return stocks
+    
+    def _check_candidates(self, nse_upper_circuit_stocks: List[Dict]):
+        """Run the 14-day check for each candidate, journaling every verdict"""
+        # Qualifying symbols whose company name / market cap are still to be fetched
+        pending_details = []
+        
         # Step 2: For each stock, check if it hit any circuit in last 14 days
         for stock in nse_upper_circuit_stocks:
             symbol = stock['symbol']
             pct_change = stock['pct_change'] if stock['pct_change'] else 0
             
+            # Already decided by an interrupted earlier run
+            verdict = self.journal.verdicts.get(symbol)
+            if verdict is not None:
+                if verdict['row']:
+                    self.results.append(verdict['row'])
+                    if not verdict['details']:
+                        pending_details.append(symbol)
+                print(f"   ↷ {symbol} - verdict restored from journal")
+                continue
+            
             # Get actual price band (circuit limit) from NSE data!
             circuit_limit = stock.get('price_band', 10)
             
             print(f"Checking {symbol} (Change: {pct_change:.2f}%, Circuit: {circuit_limit}%)...")
             
             # Check if hit any circuit in last 14 days using the ACTUAL circuit limit from NSE
-            hit_in_last_14_days = self.check_historical_circuit(symbol, circuit_limit)
+            hit_in_last_14_days = self.check_historical_circuit(symbol, circuit_limit, as_of=self.journal.scan_date)
             
             if not hit_in_last_14_days:
-                # Stock qualifies! Get additional details
+                # Stock qualifies! Details are fetched in bulk once all symbols are checked
                 print(f"   ✓ {symbol} - First time in 14 days! (No upper/lower circuit)")
                 
-                details = self.get_stock_details(symbol)
-                
-                self.results.append({
+                row = {
                     'Symbol': symbol,
-                    'Company Name': details['company_name'],
+                    'Company Name': 'N/A',
                     'Date': datetime.now().strftime('%Y-%m-%d'),
                     'Open': "N/A",  # NSE API doesn't provide open price
                     'Close': f"₹{stock['ltp']:.2f}",
@@ -564,21 +859,122 @@ class NSEUpperCircuitFinder:
                     'Low': f"₹{stock['low']:.2f}" if stock['low'] > 0 else "N/A",
                     'Change %': f"{pct_change:.2f}%",
                     'Circuit Limit': f"{circuit_limit:.0f}%",  # Actual circuit limit from NSE!
-                    'Market Cap': details['market_cap'],
+                    'Market Cap': 'N/A',
                     'Volume': f"{stock['volume']:,.0f}" if stock['volume'] > 0 else "N/A"
-                })
+                }
+                self.results.append(row)
+                self.journal.record_verdict(symbol, False, row)
+                pending_details.append(symbol)
             else:
                 print(f"   ✗ {symbol} - Hit circuit in last 14 days (skipped)")
+                self.journal.record_verdict(symbol, True)
             
             time.sleep(0.1)  # Small delay
         
-        elapsed = (datetime.now() - start_time).total_seconds()
-        print()
-        print(f"✅ NSE-optimized scan complete in {elapsed:.1f} seconds!")
-        print(f"   Checked only {len(nse_upper_circuit_stocks)} stocks (vs 2,184 in full scan)")
-        print(f"   Speed improvement: ~{(26*60)/elapsed:.0f}x faster than full scan!")
+        # Step 3: Company name and market cap for all qualifying stocks in one batched request
+        if pending_details:
+            print()
+            print(f"📇 Fetching details for {len(pending_details)} qualifying stocks...")
+            details_by_symbol = self.get_stock_details_bulk(pending_details)
+            rows_by_symbol = {row['Symbol']: row for row in self.results}
+            for symbol, details in details_by_symbol.items():
+                rows_by_symbol[symbol]['Company Name'] = details['company_name']
+                rows_by_symbol[symbol]['Market Cap'] = details['market_cap']
+                self.journal.record_details(symbol, details)
+    
+    def replay_shard(self, scan_date: str, shard: int, shard_count: int) -> List[Dict]:
+        """
+        Re-run the scan for one archived date, restricted to one symbol shard
         
-        return self.results
+        Args:
+            scan_date: Date to replay (YYYY-MM-DD); uses the last archived NSE snapshot of that day
+            shard: Shard index handled by this call
+            shard_count: Total number of shards the date is split into
+            
+        Returns:
+            One result dict per candidate symbol in the shard, with its 14-day verdict
+            
+        Raises:
+            work_queue.PermanentTaskError: If no NSE snapshot was archived on that date
+            HistoryUnavailable: If Yahoo history can't be fetched (the task is retried)
+        """
+        record = self.snapshot_archive.get(scan_date)
+        if record is None or not record['timestamp'].startswith(scan_date):
+            raise work_queue.PermanentTaskError(f"no snapshot archived for {scan_date}")
+        
+        as_of = datetime.strptime(scan_date, '%Y-%m-%d').date()
+        candidates = [
+            stock for stock in self._parse_upper_circuit_stocks(record['data'], session_date=as_of)
+            if work_queue.shard_of(stock['symbol'], shard_count) == shard
+        ]
+        
+        results = []
+        for stock in candidates:
+            circuit_limit = stock.get('price_band', 10)
+            hit = self.check_historical_circuit(stock['symbol'], circuit_limit, as_of=as_of, strict=True)
+            results.append({
+                'Symbol': stock['symbol'],
+                'Date': scan_date,
+                'Snapshot': record['timestamp'],
+                'Close': stock['ltp'],
+                'Change %': stock['pct_change'],
+                'Circuit Limit': circuit_limit,
+                'Volume': stock['volume'],
+                'Hit Circuit In Lookback': hit,
+                'Qualifies': not hit,
+            })
+        return results
+    
+    def precompute_circuit_table(self, session: Optional[date] = None) -> Optional[CircuitPriceTable]:
+        """
+        Build the exact circuit price table for the session after `session`
+        
+        Args:
+            session: Session whose closing prices are used (defaults to the latest session up to today)
+            
+        Returns:
+            The saved table, or None if the session's or month-end bhavcopy isn't available
+        """
+        session = session or datetime.now().date()
+        if not self.calendar.is_session(session):
+            session = self.calendar.previous_session(session)
+        next_session = self.calendar.next_session(session)
+        print(f"🧮 Precomputing circuit prices for {next_session} from the {session} close...")
+        
+        bhavcopy = download_bhavcopy(session)
+        if bhavcopy is None:
+            return None
+        quotes = load_bhavcopy(bhavcopy)
+        
+        # Bands for the next session: NSE's band file when available, else the latest known band
+        if not self.band_history.download(next_session):
+            print(f"   ⚠️  Using the last known bands for {next_session}; symbols whose live band "
+                  f"differs at scan time fall back to the 1% rule")
+        closes = {symbol: quote['close'] for symbol, quote in quotes.items()}
+        bands = {}
+        for symbol in closes:
+            band = self.band_history.band_on(symbol, next_session)
+            if band is not None:
+                bands[symbol] = band
+        
+        # Ticks are fixed for the month from the close on the previous month's last session
+        month_end = self.calendar.previous_session(next_session.replace(day=1))
+        if month_end == session:
+            month_end_quotes = quotes
+        else:
+            month_end_bhavcopy = download_bhavcopy(month_end)
+            if month_end_bhavcopy is None:
+                return None
+            month_end_quotes = load_bhavcopy(month_end_bhavcopy)
+        ticks = ticks_from_month_end({symbol: quote['close'] for symbol, quote in month_end_quotes.items()})
+        
+        table = CircuitPriceTable.build(next_session, closes, bands, ticks)
+        if len(table) == 0:
+            print(f"   ❌ No symbol has both a band and a tick for {next_session}; table not saved")
+            return None
+        path = table.save()
+        print(f"   ✓ {len(table)} of {len(closes)} symbols have exact circuit prices ({path})")
+        return table
     
     def display_results(self):
         """Display the results in a formatted table"""
@@ -618,8 +1014,11 @@ class NSEUpperCircuitFinder:
             filename = f"upper_circuit_stocks_{date_str}.csv"
             filepath = os.path.join(csv_dir, filename)
             
-            # Save CSV file
-            df.to_csv(filepath, index=False)
+            # Save CSV file (write to a temp file and rename, so an interrupted
+            # run never leaves a half-written CSV behind)
+            tmp_filepath = f"{filepath}.tmp"
+            df.to_csv(tmp_filepath, index=False)
+            os.replace(tmp_filepath, filepath)
             file_size = os.path.getsize(filepath)
             print(f"\n💾 Results saved to: {filepath}")
             print(f"   File size: {file_size} bytes")
@@ -849,9 +1248,16 @@ This is an automated alert for informational purposes only. Not financial advice
             print("   Results are still saved in CSV file.")
 
 
-def main():
+def run_scan(profiler: Optional[RunProfiler] = None,
+             hedge_delay: float = candidate_sources.HEDGE_DELAY_SECONDS,
+             candidate_timeout: float = candidate_sources.CANDIDATE_TIMEOUT_SECONDS):
     """
-    Main function using NSE-optimized approach
+    Run a full scan using the NSE-optimized approach
+    
+    Args:
+        profiler: If given, each stage is CPU/memory profiled into run artifacts
+        hedge_delay: Seconds to wait on NSE before also starting the local candidate sources
+        candidate_timeout: Upper bound in seconds on fetching the candidate list
     """
     print("="*80)
     print("NSE-OPTIMIZED UPPER CIRCUIT FINDER")
@@ -866,17 +1272,105 @@ def main():
     print("   4. Result: Only STRONGEST, STABLE momentum stocks!")
     print()
     
+    stage = profiler.stage if profiler else (lambda name: nullcontext())
+    
     # Create NSE-optimized finder
-    finder = NSEUpperCircuitFinder()
+    finder = NSEUpperCircuitFinder(hedge_delay, candidate_timeout)
+    
+    try:
+        # Scan stocks
+        with stage("scan_stocks"):
+            finder.scan_stocks()
+        
+        # Display results
+        with stage("display_results"):
+            finder.display_results()
+        
+        # Create GitHub issue with results
+        with stage("create_github_issue"):
+            finder.create_github_issue()
+    finally:
+        if profiler:
+            profiler.write_summary()
+
+
+def run_replay(args):
+    """
+    Enqueue, work on, merge or inspect a distributed replay
+    """
+    queue = work_queue.WorkQueue(args.queue)
+    
+    if args.action == "enqueue":
+        if not args.start:
+            print("❌ --start is required for enqueue")
+            return
+        start = datetime.strptime(args.start, '%Y-%m-%d').date()
+        end = datetime.strptime(args.end or args.start, '%Y-%m-%d').date()
+        calendar = NSETradingCalendar()
+        sessions = calendar.sessions_before(end + timedelta(days=1), (end - start).days + 1)
+        dates = [day.strftime('%Y-%m-%d') for day in sessions if day >= start]
+        added = queue.enqueue(dates, args.shards)
+        print(f"📥 Enqueued {added} task(s): {len(dates)} session(s) x {args.shards} shard(s)")
+    elif args.action == "work":
+        finder = NSEUpperCircuitFinder()
+        work_queue.run_worker(queue, finder.replay_shard, args.worker_id, args.lease, args.max_tasks)
+    elif args.action == "merge":
+        written = queue.merge(args.output)
+        for day, count in written.items():
+            print(f"   💾 {day}: {count} row(s)")
+        print(f"✅ Merged {len(written)} date(s) into {args.output}/")
+    
+    print(f"   Queue status: {queue.status()}")
+
+
+def main():
+    """
+    Command line entry point (defaults to running a scan)
+    """
+    parser = argparse.ArgumentParser(description="NSE-optimized upper circuit finder")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write CPU (cProfile + stack samples) and memory (tracemalloc) profiles for the scan")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="Directory for profile artifacts")
+    parser.add_argument("--hedge-delay", type=float, default=candidate_sources.HEDGE_DELAY_SECONDS,
+                        help="Seconds to wait on NSE before also trying the local candidate sources")
+    parser.add_argument("--candidate-timeout", type=float, default=candidate_sources.CANDIDATE_TIMEOUT_SECONDS,
+                        help="Give up on the candidate list after this many seconds")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    subparsers.add_parser("scan", help="Scan NSE for fresh upper circuit stocks (default)")
+    
+    replay_parser = subparsers.add_parser("replay", help="Distributed replay of archived snapshots via a work queue")
+    replay_parser.add_argument("action", choices=["enqueue", "work", "merge", "status"])
+    replay_parser.add_argument("--queue", default=work_queue.QUEUE_PATH, help="SQLite queue file (shared between workers)")
+    replay_parser.add_argument("--start", help="First date to enqueue (YYYY-MM-DD)")
+    replay_parser.add_argument("--end", help="Last date to enqueue (YYYY-MM-DD, default: --start)")
+    replay_parser.add_argument("--shards", type=int, default=work_queue.DEFAULT_SHARD_COUNT, help="Symbol shards per date")
+    replay_parser.add_argument("--worker-id", help="Worker id (default: host:pid)")
+    replay_parser.add_argument("--lease", type=float, default=work_queue.DEFAULT_LEASE_SECONDS, help="Lease seconds")
+    replay_parser.add_argument("--max-tasks", type=int, help="Stop after this many tasks")
+    replay_parser.add_argument("--output", default=work_queue.REPLAY_OUTPUT_DIR, help="Directory for merged CSVs")
+    
+    precompute_parser = subparsers.add_parser(
+        "precompute-circuits", help="Build tick-exact circuit prices for the next session from the bhavcopy")
+    precompute_parser.add_argument("--date", help="Session whose close is used (YYYY-MM-DD, default: latest)")
     
-    # Scan stocks
-    finder.scan_stocks()
+    serve_parser = subparsers.add_parser("serve", help="Serve scan results from csv/ as a JSON API")
+    serve_parser.add_argument("--host", default=results_server.DEFAULT_HOST, help="Interface to bind")
+    serve_parser.add_argument("--port", type=int, default=results_server.DEFAULT_PORT, help="TCP port")
+    serve_parser.add_argument("--csv-dir", default=results_server.CSV_DIR, help="Directory with result CSVs")
     
-    # Display results
-    finder.display_results()
+    args = parser.parse_args()
     
-    # Create GitHub issue with results
-    finder.create_github_issue()
+    if args.command == "serve":
+        results_server.serve(args.host, args.port, args.csv_dir)
+    elif args.command == "replay":
+        run_replay(args)
+    elif args.command == "precompute-circuits":
+        session = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else None
+        if NSEUpperCircuitFinder().precompute_circuit_table(session) is None:
+            sys.exit(1)
+    else:
+        run_scan(RunProfiler(args.profile_dir) if args.profile else None, args.hedge_delay, args.candidate_timeout)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,364 @@
+"""
+SQLite-backed work queue for distributing historical replays.
+
+A replay is split into (scan date, symbol shard) tasks. Any number of worker
+processes - on one machine or several hosts sharing the database file - claim
+tasks under a time-limited lease, keep the lease alive with a heartbeat while
+they work, and store their partial results back in the queue. A coordinator
+then merges the finished tasks into one CSV per date.
+
+If a worker crashes, its lease simply expires and the next worker to call
+claim() takes the task over. No broker service is needed: claims are made
+atomic with SQLite's write lock (BEGIN IMMEDIATE). The database uses the
+default rollback journal rather than WAL, because WAL does not work on
+network filesystems.
+"""
+
+import os
+import csv
+import json
+import time
+import zlib
+import socket
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+QUEUE_PATH = os.path.join("data", "replay", "queue.sqlite")
+REPLAY_OUTPUT_DIR = os.path.join("data", "replay")
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_SHARD_COUNT = 8
+MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    scan_date TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    shard_count INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated REAL,
+    UNIQUE (scan_date, shard, shard_count)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+"""
+
+
+class PermanentTaskError(Exception):
+    """Raised by a replay task that can never succeed (e.g. no archived snapshot); the task is failed without retries"""
+
+
+def shard_of(symbol: str, shard_count: int) -> int:
+    """Stable symbol -> shard assignment (same on every host and Python process)"""
+    return zlib.crc32(symbol.encode("utf-8")) % shard_count
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Lease-based task queue stored in a single SQLite file
+    """
+
+    def __init__(self, path: str = QUEUE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; transactions are opened explicitly where needed.
+        # A new connection per call keeps the queue safe to use from any thread.
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, scan_dates: List[str], shard_count: int = DEFAULT_SHARD_COUNT) -> int:
+        """
+        Add one task per (date, shard); tasks that already exist are left untouched
+
+        A date already enqueued with a different shard count is skipped, since
+        merging both task sets would list every symbol twice.
+
+        Returns:
+            Number of new tasks added
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = {row["scan_date"]: row["shard_count"] for row in conn.execute(
+                "SELECT DISTINCT scan_date, shard_count FROM tasks"
+            )}
+            rows = []
+            for day in scan_dates:
+                if existing.get(day, shard_count) != shard_count:
+                    print(f"   ⚠️  {day} is already enqueued with {existing[day]} shards; skipped")
+                    continue
+                rows.extend((day, shard, shard_count, now) for shard in range(shard_count))
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (scan_date, shard, shard_count, updated) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+            return added
+        finally:
+            conn.close()
+
+    def claim(self, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict]:
+        """
+        Claim the next pending task, or one whose lease has expired
+
+        Returns:
+            Task dict (id, scan_date, shard, shard_count, attempts), or None if nothing is claimable
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Tasks whose last allowed attempt crashed are given up on
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', error = 'lease expired', updated = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, MAX_ATTEMPTS),
+            )
+            row = conn.execute(
+                """
+                SELECT id, scan_date, shard, shard_count, attempts, status, worker FROM tasks
+                WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                  AND attempts < ?
+                ORDER BY scan_date, shard
+                LIMIT 1
+                """,
+                (now, MAX_ATTEMPTS),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                """
+                UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?,
+                                 attempts = attempts + 1, updated = ?
+                WHERE id = ?
+                """,
+                (worker, now + lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        if row["status"] == "leased":
+            print(f"   ♻️  Took over expired lease of task {row['id']} from {row['worker']}")
+        return {
+            "id": row["id"],
+            "scan_date": row["scan_date"],
+            "shard": row["shard"],
+            "shard_count": row["shard_count"],
+            "attempts": row["attempts"] + 1,
+        }
+
+    def renew(self, task_id: int, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extend a lease; False means the lease was lost to another worker"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + lease_seconds, time.time(), task_id, worker),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, task_id: int, worker: str, result: List[Dict]) -> bool:
+        """
+        Store a task's partial result and mark it done
+
+        Returns:
+            False if another worker has since taken the task over (result discarded)
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                """
+                UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_expires = NULL, updated = ?
+                WHERE id = ? AND worker = ? AND status = 'leased'
+                """,
+                (json.dumps(result, ensure_ascii=False), time.time(), task_id, worker),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def fail(self, task_id: int, worker: str, error: str, permanent: bool = False):
+        """
+        Release a task after an error; it is retried until MAX_ATTEMPTS is reached
+
+        Args:
+            permanent: Fail the task right away instead of retrying it
+        """
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                UPDATE tasks SET status = CASE WHEN ? OR attempts >= ? THEN 'failed' ELSE 'pending' END,
+                                 error = ?, lease_expires = NULL, updated = ?
+                WHERE id = ? AND worker = ? AND status = 'leased'
+                """,
+                (permanent, MAX_ATTEMPTS, error, time.time(), task_id, worker),
+            )
+        finally:
+            conn.close()
+
+    def status(self) -> Dict[str, int]:
+        """Task counts by status"""
+        conn = self._connect()
+        try:
+            return {row["status"]: row["n"] for row in conn.execute(
+                "SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"
+            )}
+        finally:
+            conn.close()
+
+    def merge(self, output_dir: str = REPLAY_OUTPUT_DIR) -> Dict[str, int]:
+        """
+        Merge finished tasks into replay_<YYYYMMDD>.csv, one file per date
+
+        Only dates whose shards are all done are written, so a merge never
+        produces a partial day.
+
+        Returns:
+            Mapping of date -> number of rows written
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT scan_date, shard_count, status, error, result FROM tasks ORDER BY scan_date, shard"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        by_date: Dict[str, List[Dict]] = {}
+        shard_counts: Dict[str, set] = {}
+        incomplete = set()
+        failed: Dict[str, str] = {}
+        for row in rows:
+            shard_counts.setdefault(row["scan_date"], set()).add(row["shard_count"])
+            if row["status"] != "done":
+                incomplete.add(row["scan_date"])
+                if row["status"] == "failed":
+                    failed.setdefault(row["scan_date"], row["error"] or "failed")
+                continue
+            by_date.setdefault(row["scan_date"], []).extend(json.loads(row["result"] or "[]"))
+
+        os.makedirs(output_dir, exist_ok=True)
+        written = {}
+        for day, results in sorted(by_date.items()):
+            if day in incomplete:
+                continue
+            if len(shard_counts[day]) > 1:
+                print(f"   ⚠️  {day} was enqueued with several shard counts {sorted(shard_counts[day])}; not merged")
+                continue
+            path = os.path.join(output_dir, f"replay_{day.replace('-', '')}.csv")
+            tmp_path = f"{path}.tmp"
+            fieldnames = list(results[0].keys()) if results else ["Symbol"]
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(sorted(results, key=lambda result: result["Symbol"]))
+            os.replace(tmp_path, path)
+            written[day] = len(results)
+
+        for day, error in sorted(failed.items()):
+            print(f"   ❌ {day}: {error}")
+        unfinished = incomplete - set(failed)
+        if unfinished:
+            print(f"   ℹ️  Skipped {len(unfinished)} date(s) with unfinished shards")
+        return written
+
+
+class LeaseHeartbeat:
+    """Keeps a task's lease alive from a background thread while it is being worked on"""
+
+    def __init__(self, queue: WorkQueue, task_id: int, worker: str, lease_seconds: float):
+        self.queue = queue
+        self.task_id = task_id
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{task_id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.renew(self.task_id, self.worker, self.lease_seconds):
+                    self.lost = True
+                    return
+            except sqlite3.Error as e:
+                print(f"   ⚠️  Lease renewal failed for task {self.task_id}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_worker(queue: WorkQueue, replay_task, worker: Optional[str] = None,
+               lease_seconds: float = DEFAULT_LEASE_SECONDS, max_tasks: Optional[int] = None) -> int:
+    """
+    Claim and process tasks until the queue is drained
+
+    Args:
+        queue: The shared work queue
+        replay_task: Callable(scan_date, shard, shard_count) -> list of result dicts
+        worker: Worker id (defaults to host:pid)
+        lease_seconds: Lease duration; renewed every lease_seconds / 3
+        max_tasks: Stop after this many tasks (None = until no work is left)
+
+    Returns:
+        Number of tasks completed by this worker
+    """
+    worker = worker or default_worker_id()
+    completed = 0
+    while max_tasks is None or completed < max_tasks:
+        task = queue.claim(worker, lease_seconds)
+        if task is None:
+            break
+
+        print(f"🔧 [{worker}] Task {task['id']}: {task['scan_date']} shard {task['shard'] + 1}/{task['shard_count']} "
+              f"(attempt {task['attempts']})")
+        try:
+            with LeaseHeartbeat(queue, task["id"], worker, lease_seconds) as heartbeat:
+                result = replay_task(task["scan_date"], task["shard"], task["shard_count"])
+            if heartbeat.lost or not queue.complete(task["id"], worker, result):
+                print(f"   ⚠️  Lease on task {task['id']} was lost; result discarded")
+                continue
+            completed += 1
+            print(f"   ✓ Task {task['id']} done ({len(result)} rows)")
+        except Exception as e:
+            queue.fail(task["id"], worker, str(e) if isinstance(e, PermanentTaskError) else repr(e),
+                       permanent=isinstance(e, PermanentTaskError))
+            print(f"   ❌ Task {task['id']} failed: {e}")
+
+    print(f"🏁 [{worker}] No more claimable tasks ({completed} completed)")
+    return completed